@@ -1,11 +1,18 @@
 """Script to plot stacked plot of production and loss rates of species from
 AtChem2 output files"""
 #imports
+import matplotlib
+matplotlib.use("Agg") #plots are only saved to pdf, so no display is needed
 import matplotlib.pyplot as plt
+from matplotlib.transforms import nonsingular
 from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib import cm
-from read_output.read_rate_output import time_list, reaction_dict, read_l_rates, read_p_rates
-import pandas as pd
+from read_output.read_rate_output import time_list
+from read_output.rate_dataset import read_model_output
+from read_output.lumping import lump_rates
+from read_output.ranking import top_rates
+from read_output.contributions import contribution_dict
+import numpy as np
 from datetime import date
 import sys
 import ast
@@ -19,29 +26,55 @@ def string_to_bool(string):
         return False
     else:
         raise Exception("Provided bool does not match True or False")
+
+def stack_ylims(rates):
+    """function to calculate the y axis limits of a stacked plot of a list of
+    rates (the range of the stacked rates and 0, with matplotlib's default 
+    margin) without drawing it. Returns None if there are no rates"""
+    if len(rates) == 0:
+        return None
+    stacked=np.cumsum(np.asarray(rates, dtype=np.float64), axis=0)
+    if np.all(np.isnan(stacked)):
+        return None
+    low=min(0.0, np.nanmin(stacked))
+    high=max(0.0, np.nanmax(stacked))
+    if low == high:
+        low,high=nonsingular(low, high, expander=0.05)
+
+    #the margin isn't added beyond the baseline of the plot (0)
+    margin=plt.rcParams["axes.ymargin"]*(high-low)
+    return (low-margin if low != 0 else low, high+margin if high != 0 else high)
+
+def plot_stack(ax, rates, labels, title, ylabel, ylims=None):
+    """function to draw a stacked plot of the rates of each reaction (the 
+    values of the dictionary "rates") against time on the axes "ax". Plots
+    of many timesteps are rasterized, so the pdf doesn't hold every vertex"""
+    ax.stackplot(times,[v for v in rates.values()],labels=labels,
+                 colors=cols([i for i,x in enumerate(labels)]),
+                 rasterized=len(times) > RASTER_TIMES)
+    if ylims is not None:
+        ax.set_ylim(ylims)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel("time / s")
+    ax.set_title(title)
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
         
-def get_keys(dictionary,val): 
-    """function to return keys for any value"""
-    keys=[]
-    for key, value in dictionary.items(): 
-         if val == value: 
-             keys.append(key)
-    if keys:
-        return keys
-    else:
-        #if value isn't found the raise exception
-        raise Exception(f"Specified value ({val}) doesn't exist in the dictionary")
+#number of timesteps above which stacked plots are rasterized
+RASTER_TIMES=1000
 
 #read in arguments from command line
 args=sys.argv
 kwarg_dict={"drop_rev":True,"title_page_text":"","remove_l_reactions":[],
             "remove_p_reactions":[],"exclusive_l_reactions":[],
-            "exclusive_p_reactions":[],"lump_l_reactions":{},"lump_p_reactions":{}}
+            "exclusive_p_reactions":[],"lump_l_reactions":{},"lump_p_reactions":{},
+            "families":None,"lump_classes":None,
+            "rank_metric":"median","float32":False,"page_per_species":False,
+            "cache":True,"n_workers":None}
 
 if len(args) < 6:
     raise Exception("""Must provide at least 5 arguments (in this order):
                      - Model Output Path
-                     - Species of Interest (Comma Separated List e.g. NO2,O3,NO3)
+                     - Species of Interest (Comma Separated List e.g. NO2,O3,NO3, or a family e.g. NOx)
                      - Number of Reactions to List (int, e.g. 10 for Top 10 Reactions, with the rest being lumped into "Other")
                      - Start Time (In Model Time or "START")
                      - End Time (In Model Time or "END")
@@ -55,6 +88,16 @@ if len(args) < 6:
                      - exclusive_p_reactions (Comma Separated List, the only reactions to be included in the production plots)
                      - lump_l_reactions (Dictionary for each species (e.g. "{'NO2':{'NOx':['NO2+O3=NO3','HO2+NO2=OH+NO2']},'HO2':{'HOx':'HO2+O3=OH'}}"), loss reactions to add together into one catagory)
                      - lump_p_reactions (Dictionary for each species (e.g. "{'NO2':{'NOx':['NO2+O3=NO3','HO2+NO2=OH+NO2']},'HO2':{'HOx':'HO2+O3=OH'}}"), production reactions to add together into one catagory)
+                     - families (string, path to a config file of chemical families. Default: read_output/families.cfg)
+                     - cache (bool, Store the parsed rate files in (and load them from) a binary cache in the output directory? If False only the selected times are parsed. Default: True)
+                     - n_workers (int, number of processes to parse each rate file with in chunks, for large files. Default: one process per file)
+                     - page_per_species (bool, Plot each species on its own page (with its loss, production and % plots), drawn on one reused figure so memory use doesn't grow with the number of species? Default: False)
+                     - float32 (bool, Store the percentage contributions as 32-bit floats to halve their memory for long runs? Default: False)
+                     - rank_metric (string, how the top reactions are ranked: median, mean, max, integral or abs_net (size of the mean). Default: median)
+                     - lump_classes (string, path to a config file of classes of species (e.g. RO2) for lumping rules, in addition to the families)
+                     
+                     Lumped reactions can be reaction equations or rules: "regex:" followed by a regular expression (e.g. "regex:=.*HNO3"), 
+                     or "reactants:"/"products:" followed by species, classes or * (any species) joined by + (e.g. "reactants:RO2+NO")
                      """)
 else: #if 5 or more arguments passed then get the initial 5
     print(args)    
@@ -89,29 +132,22 @@ if len(args) > 6: #if there are more than 5 arguments then process the kwargs
         kw=kwarg.split("=")[0]
         arg=kwarg.split("=",1)[1] #only split at the first =, may be subsequent = from reaction definitions
         
-        if (kw == "drop_rev"): #bools
+        if (kw == "drop_rev") or (kw == "float32") or (kw == "page_per_species") or (kw == "cache"): #bools
             kwarg_dict[kw] = string_to_bool(arg)
-        elif kw == "title_page_text": #strings
+        elif (kw == "title_page_text") or (kw == "families") or (kw == "lump_classes") or (kw == "rank_metric"): #strings
             kwarg_dict[kw] = arg
+        elif kw == "n_workers": #ints
+            kwarg_dict[kw] = int(arg)
         elif (kw == "remove_l_reactions") or (kw == "remove_p_reactions") or (kw == "exclusive_l_reactions") or (kw == "exclusive_p_reactions"):  #lists
             kwarg_dict[kw] = arg.strip("[]").split(",") #strip [] in case it was entered as python syntax list
         else: #dicts
             kwarg_dict[kw] = ast.literal_eval(arg)
 
-#read rates output files and record production and loss rates
-l_rates=read_l_rates(out_path+"/lossRates.output",species=species,
-                     drop_rev=kwarg_dict["drop_rev"], error_for_non_species=False)
-p_rates=read_p_rates(out_path+"/productionRates.output",species=species,
-                     drop_rev=kwarg_dict["drop_rev"], error_for_non_species=False)
-
-
-#get list of times and definitions of reactionNumbers
+#get list of model times (from an index of the timesteps in the rate file)
 times=time_list(out_path+"/productionRates.output")
-l_reactions=reaction_dict(out_path+"/lossRates.output")
-p_reactions=reaction_dict(out_path+"/productionRates.output")
 
 
-#filter rates to only the specified times
+#find indexes of the specified times
 if start != "START":
     absolute_difference_function = lambda list_value : abs(list_value - start)
     closest_value = min(times, key=absolute_difference_function)
@@ -128,149 +164,92 @@ if end != "END":
 else:
     endindex = -1
 
-times = times[startindex:endindex]
-for k1 in p_rates:
-    for k2 in p_rates[k1]:
-        p_rates[k1][k2] = p_rates[k1][k2][startindex:endindex]
-for k1 in l_rates:
-    for k2 in l_rates[k1]:
-        l_rates[k1][k2] = l_rates[k1][k2][startindex:endindex]
+
+#read rates output files (concurrently, once each, and only the specified 
+#times if not using the cache) and record production and loss rates
+rate_data=read_model_output(out_path, window=slice(startindex,endindex),
+                            concentrations=False, cache=kwarg_dict["cache"],
+                            n_workers=kwarg_dict["n_workers"])
+l_tensor=rate_data.l_rate_tensor(species=species, 
+                                 drop_rev=kwarg_dict["drop_rev"],
+                                 error_for_non_species=False,
+                                 families=kwarg_dict["families"])
+p_tensor=rate_data.p_rate_tensor(species=species, 
+                                 drop_rev=kwarg_dict["drop_rev"],
+                                 error_for_non_species=False,
+                                 families=kwarg_dict["families"])
+
+
+#get list of times and definitions of reactionNumbers
+times=rate_data.times.tolist()
+l_reactions=rate_data.l_reactions
+p_reactions=rate_data.p_reactions
 
 
 #if individual reaction(s) specified in "exclusive_reactions" then select only 
-#that reactions
+#that reactions, and remove reactions that don't want plotted (specified in 
+#remove_x_reactions variables). Reactions are found with an index of the 
+#reaction equations, and selected with one mask for all species (the rows are
+#selected once, and used for both the top n and lumped reactions)
+l_keep=~l_tensor.equation_mask(kwarg_dict["remove_l_reactions"])
 if kwarg_dict["exclusive_l_reactions"] != []:
-    exclloss=[]
-    for r in kwarg_dict["exclusive_l_reactions"]:
-        exclloss += [x for x in get_keys(l_reactions,r)]
-    for s in l_rates:
-        l_rates[s]={k:l_rates[s][k] for k in l_rates[s].keys() if k in exclloss}
+    l_keep&=l_tensor.equation_mask(kwarg_dict["exclusive_l_reactions"])
+l_tensor=l_tensor.select_rows(l_keep)
 
+p_keep=~p_tensor.equation_mask(kwarg_dict["remove_p_reactions"])
 if kwarg_dict["exclusive_p_reactions"] != []:
-    exclprod=[]
-    for r in kwarg_dict["exclusive_p_reactions"]:
-        exclprod += [x for x in get_keys(p_reactions,r)]
-    for s in p_rates:
-        p_rates[s]={k:p_rates[s][k] for k in p_rates[s].keys() if k in exclprod}
-            
-    
-#remove reactions that don't want plotted (specified in remove_x_reactions variables)
-remloss=[]
-for r in kwarg_dict["remove_l_reactions"]:
-    remloss += [x for x in get_keys(l_reactions,r)]
-for s in l_rates:
-    try:
-        l_rates[s]={k:l_rates[s][k] for k in l_rates[s].keys() if k not in remloss} #replace l_rates with dictionary containing only desired reactions
-    except KeyError: #KeyError raised if one of the exclusive reactions doesn't include one of the species
-        pass
-
-remprod=[]
-for r in kwarg_dict["remove_p_reactions"]:
-    remprod += [x for x in get_keys(p_reactions,r)]
-for s in p_rates:
-    try:
-        p_rates[s]={k:p_rates[s][k] for k in p_rates[s].keys() if k not in remprod} #replace l_rates with dictionary containing only desired reactions
-    except KeyError: #KeyError raised if one of the exclusive reactions doesn't include one of the species
-        pass
+    p_keep&=p_tensor.equation_mask(kwarg_dict["exclusive_p_reactions"])
+p_tensor=p_tensor.select_rows(p_keep)
          
 #
-#use dataframes to sort dictionary and select top n
-pdrop=[] #empty dictionaries raise errors in plotting, so remove them (i.e. if there are no production and/or loss reactions of a species)
-ldrop=[]
-for s in l_rates:
-    try:
-        l_rates_df=pd.DataFrame.from_dict(l_rates[s]).reindex(pd.DataFrame.from_dict(l_rates[s]).median().sort_values(ascending=False).index, axis=1)
-        l_rates[s]=l_rates_df.iloc[:,0:top_n].to_dict("list")
-        if l_rates[s]:
-            l_rates[s]["Other"] = l_rates_df.iloc[:,top_n:].sum(axis=1).to_list()
-    except KeyError as e:
-        if e.args[0] == 0: #if the KeyError is due to an empty dict, append species to list of keys to be removed
-            ldrop.append(s)
-l_rates={k:l_rates[k] for k in l_rates.keys() if (l_rates[k]) and (k not in ldrop)}
-
-for s in p_rates:
-    try:
-        p_rates_df=pd.DataFrame.from_dict(p_rates[s]).reindex(pd.DataFrame.from_dict(p_rates[s]).median().sort_values(ascending=False).index, axis=1)
-        p_rates[s]=p_rates_df.iloc[:,0:top_n].to_dict("list")
-        if p_rates[s]:
-            p_rates[s]["Other"] = p_rates_df.iloc[:,top_n:].sum(axis=1).to_list()
-    except KeyError as e:
-        if e.args[0] == 0: #if the KeyError is due to an empty dict, append species to list of keys to be removed
-            pdrop.append(s)
-p_rates={k:p_rates[k] for k in p_rates.keys() if (p_rates[k]) and (k not in pdrop)}
+#select the top n reactions of each species (ranked by "rank_metric") and sum
+#the rest into "Other", for all species at once. Empty dictionaries raise 
+#errors in plotting, so species without reactions are removed (i.e. if there
+#are no production and/or loss reactions of a species)
+l_top,l_other=top_rates(l_tensor, top_n, metric=kwarg_dict["rank_metric"])
+l_rates={}
+for i,(s,rates) in enumerate(l_top.to_dict().items()):
+    if rates:
+        l_rates[s]=rates
+        l_rates[s]["Other"]=l_other[i]
+
+p_top,p_other=top_rates(p_tensor, top_n, metric=kwarg_dict["rank_metric"])
+p_rates={}
+for i,(s,rates) in enumerate(p_top.to_dict().items()):
+    if rates:
+        p_rates[s]=rates
+        p_rates[s]["Other"]=p_other[i]
 
 
 #
-#if lumping reactions by reaction type then sum relavent reactions
+#if lumping reactions by reaction type then sum relavent reactions (all
+#reactions matching the lumping rules, not only the top n, are summed with one
+#grouped sum of the rates)
 if kwarg_dict["lump_l_reactions"] != {}:
-    lump_l_rxns = kwarg_dict["lump_l_reactions"]
-    new_l_rates={} #initialise dictionary with same structure as l_rates dict
-    for s in lump_l_rxns.keys():
-        new_l_rates[s]={}
-        for cat in lump_l_rxns[s]:
-            reaction_keys = []
-            for reaction in lump_l_rxns[s][cat]:
-                reaction_keys += get_keys(l_reactions,reaction)
-                
-            new_l_rates[s][cat]={k:[] for k in reaction_keys} 
-            new_l_rates[s][cat]=[sum(x) for x in zip(*[l_rates[s][k] for k in reaction_keys])] #for each species and lump of reactions, add all required reaction rates
-    
+    lumped=lump_rates(l_tensor, kwarg_dict["lump_l_reactions"],
+                      classes=kwarg_dict["lump_classes"])
     old_l_rates=l_rates
-    l_rates=new_l_rates #overwrite l_rates dict
+    l_rates=lumped #overwrite l_rates dict
     
 if kwarg_dict["lump_p_reactions"] != {}:
-    lump_p_rxns = kwarg_dict["lump_p_reactions"]
-    new_p_rates={} #initialise dictionary with same structure as l_rates dict
-    for s in lump_p_rxns.keys():
-        new_p_rates[s]={}
-        for cat in lump_p_rxns[s]:
-            reaction_keys = []
-            for reaction in lump_p_rxns[s][cat]:
-                reaction_keys += get_keys(p_reactions,reaction)
-                
-            new_p_rates[s][cat]={k:[] for k in reaction_keys} 
-            new_p_rates[s][cat]=[sum(x) for x in zip(*[p_rates[s][k] for k in reaction_keys])] #for each species and lump of reactions, add all required reaction rates
-    
+    lumped=lump_rates(p_tensor, kwarg_dict["lump_p_reactions"],
+                      classes=kwarg_dict["lump_classes"])
     old_p_rates=p_rates
-    p_rates=new_p_rates #overwrite p_rates dict
-
-
-
-#calculate procution/loss rates as a % of loss/producion from the topn reactions
-pcl_rates={}
-tot_l_rate={k:[] for k in l_rates.keys()}
-for s in tot_l_rate.keys():
-    tot_l_rate[s]=[sum(x) for x in zip(*[l_rates[s][k] for k in l_rates[s].keys()])]
-for s in l_rates.keys():
-    pcl_rates[s]={}
-    for r in l_rates[s].keys():
-        pcl_rates[s][r]=[] #list of percentage loss rates
-        for rate,tot in zip(l_rates[s][r],tot_l_rate[s]):
-            if tot != 0: #avoid divide by zero error
-                pcl_rates[s][r].append((rate/tot)*100)
-            else:
-                pcl_rates[s][r].append(0)
-pcp_rates={}
-tot_p_rate={k:[] for k in p_rates.keys()}
-for s in tot_p_rate.keys():
-    tot_p_rate[s]=[sum(x) for x in zip(*[p_rates[s][k] for k in p_rates[s].keys()])]
-for s in p_rates.keys():
-    pcp_rates[s]={}
-    for r in p_rates[s].keys():
-        pcp_rates[s][r]=[] #list of percentage loss rates
-        for rate,tot in zip(p_rates[s][r],tot_p_rate[s]):
-            if tot != 0: #avoid divide by zero error
-                pcp_rates[s][r].append((rate/tot)*100)
-            else:
-                pcp_rates[s][r].append(0)
+    p_rates=lumped #overwrite p_rates dict
+
+
+
+#calculate procution/loss rates as a % of loss/producion from the topn 
+#reactions (for all species and reactions at once, 0 where the total is 0)
+dtype=np.float32 if kwarg_dict["float32"] else np.float64
+pcl_rates=contribution_dict(l_rates, scale=100, dtype=dtype)
+pcp_rates=contribution_dict(p_rates, scale=100, dtype=dtype)
 
 
 #
 #Plotting
 pp=PdfPages("temp_rates_plot.pdf")
 cols=cm.get_cmap("tab20")
-#count number of species in rates (for plotting)
-n_species=len(l_rates)
 
 #labels for stacked plots
 l_labels={}
@@ -315,88 +294,81 @@ Plotted on {date.today()}"""
 confirstPage.text(0.5,0.2,plottxt, size=10, ha="center", wrap=True)
 pp.savefig(confirstPage)
         
-#Plot loss rates as function of time
-lfig=plt.figure(figsize=(10,5*n_species))
-
-for i,s in enumerate(l_rates):
-    #plot temporary plot without "other" to get axis limits
-    temp_fig=plt.figure()
-    temp_ax=temp_fig.add_subplot(111)
-    temp_ax.stackplot(times,[v for v in l_rates[s].values()][:-1])
-    ylims=temp_ax.get_ylim()
-        
-    #plot actual plot
-    ax=lfig.add_subplot(n_species,1,i+1)
-    ax.stackplot(times,[v for v in l_rates[s].values()],labels=l_labels[s],
-                 colors=cols([i for i,x in enumerate(l_labels[s])]))
-    
-    ax.set_ylim(ylims)
-    ax.set_ylabel(f"k[{s}] / molecule cm-3 s-1")
-    ax.set_xlabel("time / s")
-    ax.set_title(f"{s} Loss")
-    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-
-lfig.suptitle("Loss Reactions")
-pp.savefig(lfig,bbox_inches="tight")
-
-
-#Plot production rates as function of time
-pfig=plt.figure(figsize=(10,5*n_species))
-
-for i,s in enumerate(p_rates):
-    #plot temporary plot without "other" to get axis limits
-    temp_fig=plt.figure()
-    temp_ax=temp_fig.add_subplot(111)
-    temp_ax.stackplot(times,[v for v in p_rates[s].values()][:-1])
-    ylims=temp_ax.get_ylim()
-
-    #plot actual plot
-    ax=pfig.add_subplot(n_species,1,i+1)
-    ax.stackplot(times,[v for v in p_rates[s].values()],labels=p_labels[s],
-                 colors=cols([i for i,x in enumerate(p_labels[s])]))
-    
-    ax.set_ylim(ylims)
-    ax.set_ylabel(f"k[{s}] / molecule cm-3 s-1")
-    ax.set_xlabel("time / s")
-    ax.set_title(f"{s} Production")
-    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-
-pfig.suptitle("Production Reactions")
-pp.savefig(pfig,bbox_inches="tight")
-    
-#plot %loss rates vs time
-pclfig=plt.figure(figsize=(10,5*n_species))
-for i,s in enumerate(pcl_rates):
-    ax=pclfig.add_subplot(n_species,1,i+1)
-    ax.stackplot(times,[v for v in pcl_rates[s].values()],labels=l_labels[s],
-                 colors=cols([i for i,x in enumerate(l_labels[s])]))
-    ax.set_ylim(0,100)
-    
-    ax.set_ylabel("Proportion of loss / %")
-    ax.set_xlabel("time / s")
-    ax.set_title(f"{s} Loss")
-    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-
-pfig.suptitle("% Loss Reactions")
-pp.savefig(pclfig,bbox_inches="tight")
-
-
-#plot %production rates vs time
-pcpfig=plt.figure(figsize=(10,5*n_species))
-for i,s in enumerate(pcp_rates):
-    ax=pcpfig.add_subplot(n_species,1,i+1)
-    ax.stackplot(times,[v for v in pcp_rates[s].values()],labels=p_labels[s],
-                 colors=cols([i for i,x in enumerate(p_labels[s])]))
-    ax.set_ylim(0,100)
-    
-    ax.set_ylabel("Proportion of production / %")
-    ax.set_xlabel("time / s")
-    ax.set_title(f"{s} production")
-    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-
-pfig.suptitle("% production Reactions")
-pp.savefig(pcpfig,bbox_inches="tight")
+#y axis limits of the rates of each species without "Other" (calculated from
+#the stacked rates, rather than by drawing temporary plots)
+l_ylims={s:stack_ylims([v for k,v in l_rates[s].items() if k != "Other"])
+         for s in l_rates}
+p_ylims={s:stack_ylims([v for k,v in p_rates[s].items() if k != "Other"])
+         for s in p_rates}
+
+if kwarg_dict["page_per_species"]:
+    #plot a page for each species, reusing one figure (cleared for each page)
+    fig=plt.figure(figsize=(10,20))
+    for s in dict.fromkeys(list(l_rates)+list(p_rates)):
+        fig.clf()
+        axs=fig.subplots(4,1)
+        if s in l_rates:
+            plot_stack(axs[0], l_rates[s], l_labels[s], f"{s} Loss",
+                       f"k[{s}] / molecule cm-3 s-1", l_ylims[s])
+            plot_stack(axs[2], pcl_rates[s], l_labels[s], f"{s} Loss",
+                       "Proportion of loss / %", (0,100))
+        else:
+            axs[0].set_axis_off()
+            axs[2].set_axis_off()
+        if s in p_rates:
+            plot_stack(axs[1], p_rates[s], p_labels[s], f"{s} Production",
+                       f"k[{s}] / molecule cm-3 s-1", p_ylims[s])
+            plot_stack(axs[3], pcp_rates[s], p_labels[s], f"{s} production",
+                       "Proportion of production / %", (0,100))
+        else:
+            axs[1].set_axis_off()
+            axs[3].set_axis_off()
+        fig.suptitle(s)
+        pp.savefig(fig,bbox_inches="tight")
+    plt.close(fig)
 
+else:
+    #each figure has a plot for each species in the rates it plots (which can
+    #differ between loss and production, e.g. when lumping)
+    #Plot loss rates as function of time
+    lfig=plt.figure(figsize=(10,5*len(l_rates)))
+    for i,s in enumerate(l_rates):
+        ax=lfig.add_subplot(len(l_rates),1,i+1)
+        plot_stack(ax, l_rates[s], l_labels[s], f"{s} Loss",
+                   f"k[{s}] / molecule cm-3 s-1", l_ylims[s])
+    lfig.suptitle("Loss Reactions")
+    pp.savefig(lfig,bbox_inches="tight")
+    plt.close(lfig)
+
+    #Plot production rates as function of time
+    pfig=plt.figure(figsize=(10,5*len(p_rates)))
+    for i,s in enumerate(p_rates):
+        ax=pfig.add_subplot(len(p_rates),1,i+1)
+        plot_stack(ax, p_rates[s], p_labels[s], f"{s} Production",
+                   f"k[{s}] / molecule cm-3 s-1", p_ylims[s])
+    pfig.suptitle("Production Reactions")
+    pp.savefig(pfig,bbox_inches="tight")
+    plt.close(pfig)
+
+    #plot %loss rates vs time
+    pclfig=plt.figure(figsize=(10,5*len(pcl_rates)))
+    for i,s in enumerate(pcl_rates):
+        ax=pclfig.add_subplot(len(pcl_rates),1,i+1)
+        plot_stack(ax, pcl_rates[s], l_labels[s], f"{s} Loss",
+                   "Proportion of loss / %", (0,100))
+    pclfig.suptitle("% Loss Reactions")
+    pp.savefig(pclfig,bbox_inches="tight")
+    plt.close(pclfig)
+
+    #plot %production rates vs time
+    pcpfig=plt.figure(figsize=(10,5*len(pcp_rates)))
+    for i,s in enumerate(pcp_rates):
+        ax=pcpfig.add_subplot(len(pcp_rates),1,i+1)
+        plot_stack(ax, pcp_rates[s], p_labels[s], f"{s} production",
+                   "Proportion of production / %", (0,100))
+    pcpfig.suptitle("% production Reactions")
+    pp.savefig(pcpfig,bbox_inches="tight")
+    plt.close(pcpfig)
 
 pp.close()
 
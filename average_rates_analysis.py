@@ -1,6 +1,8 @@
-from read_output.read_rate_output import reaction_dict, read_p_rates, read_l_rates, time_list
-from statistics import mean
+from read_output.rate_dataset import read_model_output
+from read_output.ropa import average_rates
+from read_output.follow import RateMonitor
 from itertools import islice
+import time
 import sys
 
 #function to select first n objects in iter (dict here)
@@ -8,8 +10,46 @@ def take(n, iterable):
     "Return first n items of the iterable as a list"
     return list(islice(iterable, n))
 
+def print_average_rates(avg_p_rates, avg_l_rates, avg_r_rates, p_reactions,
+                        l_reactions, top_n):
+    """function to print the top "n" average rates for each species"""
+    print("-"*10)
+    print(f"Showing top {top_n} rate(s)")
+    print("-"*10)
+    print("PRODUCTION")
+    print()
+    for s in avg_p_rates:
+        print()
+        print(f"{s} Production")
+        top=take(top_n, avg_p_rates[s].items()) #select top "n" reactions 
+        total_sum = sum(avg_p_rates[s].values())
+        for i,r in top:
+            print(f"{p_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1 ({(r/total_sum)*100:.3g}%)")
+
+    print("-"*10)
+    print("LOSS")
+    print()
+    for s in avg_l_rates:
+        print()
+        print(f"{s} Loss")
+        top=take(top_n, avg_l_rates[s].items()) #select top "n" reactions
+        total_sum = sum(avg_l_rates[s].values())
+        for i,r in top:
+            print(f"{l_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1 ({(r/total_sum)*100:.3g}%)")
+
+    print("-"*10)
+    print("REVERSIBLE (+ve= net production, -ve= net loss)")
+    print()
+    for s in avg_r_rates:
+        print()
+        print(f"{s}")
+        top=take(top_n, avg_r_rates[s].items()) #select top "n" reactions 
+        for i,r in top: #uses p_reactions
+            print(f"{p_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1")
+
 #put command-line args into list
 args=sys.argv
+kwarg_dict={"follow":None,"rank_metric":"mean","n_workers":None}
 
 if len(args)<6: #if not enough args provided
         raise Exception("""Requred arguments are (in this order): 
@@ -17,7 +57,12 @@ if len(args)<6: #if not enough args provided
                         - species of interest (list separated by commas or "ALL") 
                         - top 'n' reactions to list for each species (e.g. '10' for top 10 most important reactions for each species)
                         - start point (in model time) for averaging over, or "START" 
-                        - end point (in model time) for averaging over, or "END" """)
+                        - end point (in model time) for averaging over, or "END"
+                        
+                        Additional key word arguments (e.g. follow=60) are:
+                        - follow (float, seconds between refreshes to follow a model that is still running, updating the averages and budgets as timesteps are written until interrupted with Ctrl+C (as without following, "END" excludes the last timestep). Default: off)
+                        - rank_metric (string, how the reactions are ranked: median, mean, max, integral or abs_net (size of the mean). The average rate is used when following a model. Default: mean)
+                        - n_workers (int, number of processes to parse each rate file with in chunks, for large files. Default: one process per file)""")
 
 else: #note args[0] will be the name of this script
     out_path=args[1] #give path to model output directory
@@ -25,174 +70,67 @@ else: #note args[0] will be the name of this script
     top_n=int(args[3]) #define number of top reactions to list in output
     start_t=args[4]
     end_t=args[5]
+
+if len(args) > 6: #if there are more than 5 arguments then process the kwargs
+    for kwarg in args[6:]:
+        kw,arg=kwarg.split("=",1)
+        if kw == "follow": #floats
+            kwarg_dict[kw]=float(arg)
+        elif kw == "n_workers": #ints
+            kwarg_dict[kw]=int(arg)
+        elif kw == "rank_metric": #strings
+            kwarg_dict[kw]=arg
+        else:
+            raise Exception(f"Unknown key word argument ({kw})")
     
 #convert lists of species to list type
 if "," in species:
     species=species.split(",")
 
-#convert "start" and "end" into indexes (based on the timesteps of the model)
-#to reference for averaging later
-timelist=time_list(out_path+"/productionRates.output") #create list of the model timesteps
-
-try:
-    start_i=timelist.index(int(start_t))
-except ValueError:
-    if start_t=="START":
-        start_i=0
-    else:
-        raise Exception("start value must be integer or 'START'")
-#convert "end" into integer
-try:
-    end_i=timelist.index(int(end_t))
-except ValueError:
-    if end_t=="END":
-        end_i=-1
-    else:
-        raise Exception("end value must be integer or 'END'")
-
-
-
-#read production rates output file and record NO3 production rates
-p_rates=read_p_rates(out_path+"/productionRates.output", species=species)
-l_rates=read_l_rates(out_path+"/lossRates.output",species=species)
-
-#get definitions of reactionNumbers
-p_reactions=reaction_dict(out_path+"/productionRates.output")
-l_reactions=reaction_dict(out_path+"/lossRates.output")
-
-
-
-#calculate net production/loss for reversible reactions.
-
-#Produce reaction dictionaries split into lists of products and reactants
-split_p_reactions={}
-for rp in p_reactions: #iterate through production reactions
-    split_p_reactions[rp]=p_reactions[rp].split("=") #split string into reactants and products
-    for i,s in enumerate(split_p_reactions[rp]):
-        split_p_reactions[rp][i]=s.split("+") #split reactants and products into individual species
-split_l_reactions={}
-for rl in l_reactions: #iterate through loss reactions
-    split_l_reactions[rl]=l_reactions[rl].split("=") 
-    for i,s in enumerate(split_l_reactions[rl]):
-        split_l_reactions[rl][i]=s.split("+")
-
-#go through production reactions and look for reverse loss reaction
-rev_rxns=[]
-for rp in split_p_reactions:
-    for rl in split_l_reactions:
-        p_to_l=set(split_p_reactions[rp][0])==set(split_l_reactions[rl][1]) #do reactants of production reaction= products of loss?
-        l_to_p=set(split_p_reactions[rp][1])==set(split_l_reactions[rl][0]) #do reactants of products production reaction= reactants of loss?
-        if p_to_l and l_to_p:
-            rev_rxns.append([rp,rl])
-
-r_rates={} #create new dict to record reversible reactions
-for s in p_rates: #initialise with keys for all species of interest
-    r_rates[s]={}
-for s in l_rates:
-    r_rates[s]={}
-
-pl_remove=[] #list to record indexes to remove from p_ and l_rates (any reactions added to r_rates)
-for v in rev_rxns:
-    for s in r_rates:
+if kwarg_dict["follow"] is not None:
+    #follow the rate output files of a running model, only parsing the 
+    #timesteps written since the last refresh and updating running averages
+    #(and budgets) of the timesteps written to both files
+    monitor=RateMonitor(out_path, 
+                        start=None if start_t=="START" else float(start_t),
+                        end=None if end_t=="END" else float(end_t),
+                        species=species)
+    final=False
+    while True:
         try:
-            prod=p_rates[s][v[0]]
-            loss=l_rates[s][v[1]]
-            diffs=[a-b for a, b in zip(prod, loss)]
-            r_rates[s][v[0]]=diffs #record net production/loss (with the production reaction as key)
-            
-            pl_remove.append([s,v[0],v[1]]) #add species and reaction numbers to list for later removal
-            
-        except KeyError: #Reaction often won't exist for the species "s"
-            pass 
-#remove reactions in r_rates from p_rates and l_rates
-for s,r1,r2 in pl_remove: 
-    try:
-        del p_rates[s][r1]
-        del l_rates[s][r2]
-    except KeyError:
-        pass
-
-
-#remove empty keys from r_rates
-r_remove=[] #list to record empty indexes to remove from r_rates
-for s in r_rates:
-    if bool(r_rates[s].keys())==False:#see if dict has no keys (i.e. is empty)
-        r_remove.append(s) #if so then remove it from the r_rates dict
-    elif bool(r_rates[s].keys()):
-        pass
-
-for s in r_remove: #remove empty dict keys from r_rates
-    del r_rates[s]
-    
-        
-#create dictionary with same structure as production/loss/reversible rates 
-#dict, but with average rates created from the list provided
-avg_p_rates={}
-for s in p_rates:
-    avg_p_rates[s]={}
-    for r in p_rates[s]:
-        avg_p_rates[s][r]=mean(p_rates[s][r][start_i:end_i])
-
-avg_l_rates={}
-for s in l_rates:
-    avg_l_rates[s]={}
-    for r in l_rates[s]:
-        avg_l_rates[s][r]=mean(l_rates[s][r][start_i:end_i])
-
-avg_r_rates={}
-for s in r_rates:
-    avg_r_rates[s]={}
-    for r in r_rates[s]:
-        avg_r_rates[s][r]=mean(r_rates[s][r][start_i:end_i])
+            if monitor.update(final=final) and monitor.times:
+                rate_data=monitor.dataset()
+                print("="*10)
+                print(f"Averages of {len(monitor.times)} timestep(s) up to model time {monitor.times[-1]:g}")
+                print_average_rates(*average_rates(rate_data, species=species,
+                                                   window=slice(None)),
+                                    rate_data.p_reactions, 
+                                    rate_data.l_reactions, top_n)
+                print("-"*10)
+                print("BUDGET (average total production, loss and net rate / molecule cm-3 s-1)")
+                print(monitor.budgets(species=species).to_string(float_format="{:.3e}".format))
+            if final:
+                break
+            time.sleep(kwarg_dict["follow"])
+        except KeyboardInterrupt: #include the last timestep and stop
+            final=True
+    sys.exit()
+
+#read production and loss rate output files concurrently (each file is parsed
+#once)
+rate_data=read_model_output(out_path, concentrations=False,
+                            n_workers=kwarg_dict["n_workers"])
 
+#get definitions of reactionNumbers
+p_reactions=rate_data.p_reactions
+l_reactions=rate_data.l_reactions
 
-#sort the average rates by value
-for s in avg_p_rates: #dictionary comprehension to sort dict by value
-        avg_p_rates[s]={k: v for k, v in sorted(avg_p_rates[s].items(), 
-                                                key=lambda item: item[1],
-                                                reverse=True)}     
-for s in avg_l_rates:
-        avg_l_rates[s]={k: v for k, v in sorted(avg_l_rates[s].items(), 
-                                                key=lambda item: item[1],
-                                                reverse=True)}
-for s in avg_r_rates: 
-        avg_r_rates[s]={k: v for k, v in sorted(avg_r_rates[s].items(), 
-                                                key=lambda item: abs(item[1]),
-                                                reverse=True)}
-
+#calculate the average production, loss and net reversible rates of the 
+#species of interest between start and end (ranked by rank_metric)
+avg_p_rates,avg_l_rates,avg_r_rates=average_rates(rate_data, species=species,
+                                                  start_t=start_t, end_t=end_t,
+                                                  metric=kwarg_dict["rank_metric"])
 
 #print the average rates for each species
-print("-"*10)
-print(f"Showing top {top_n} rate(s)")
-print("-"*10)
-print("PRODUCTION")
-print()
-for s in avg_p_rates:
-    print()
-    print(f"{s} Production")
-    top=take(top_n, avg_p_rates[s].items()) #select top "n" reactions 
-    total_sum = sum(avg_p_rates[s].values())
-    for i,r in top:
-        print(f"{p_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1 ({(r/total_sum)*100:.3g}%)")
-
-print("-"*10)
-print("LOSS")
-print()
-for s in avg_l_rates:
-    print()
-    print(f"{s} Loss")
-    top=take(top_n, avg_l_rates[s].items()) #select top "n" reactions
-    total_sum = sum(avg_l_rates[s].values())
-    for i,r in top:
-        print(f"{l_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1 ({(r/total_sum)*100:.3g}%)")
-
-print("-"*10)
-print("REVERSIBLE (+ve= net production, -ve= net loss)")
-print()
-for s in avg_r_rates:
-    print()
-    print(f"{s}")
-    top=take(top_n, avg_r_rates[s].items()) #select top "n" reactions 
-    for i,r in top: #uses p_reactions
-        print(f"{p_reactions[i]}: average rate= {r:.3e} molecule cm-3 s-1")
-
+print_average_rates(avg_p_rates, avg_l_rates, avg_r_rates, p_reactions,
+                    l_reactions, top_n)
@@ -0,0 +1,64 @@
+"""Script to list the top average production, loss and net reversible rates 
+(as average_rates_analysis.py) of many AtChem2 output directories (e.g. an
+ensemble of scenarios) at once, analysing the directories in parallel and
+gathering the results into one table"""
+#imports
+from read_output.ropa import batch_average_rates, expand_run_dirs
+import sys
+
+#put command-line args into list
+args=sys.argv
+kwarg_dict={"workers":None,"parse_workers":None,
+            "output":"batch_average_rates.csv"}
+
+if len(args)<6: #if not enough args provided
+        raise Exception("""Requred arguments are (in this order): 
+                        - paths to model output directories (list separated by commas, each of which can be a glob pattern e.g. "runs/*/output")
+                        - species of interest (list separated by commas or "ALL") 
+                        - top 'n' reactions to list for each species (e.g. '10' for top 10 most important reactions for each species)
+                        - start point (in model time) for averaging over, or "START" 
+                        - end point (in model time) for averaging over, or "END"
+                        
+                        Additional key word arguments (e.g. workers=8) are:
+                        - workers (int, number of processes to analyse the directories with. Default: number of CPUs)
+                        - parse_workers (int, number of processes each directory parses its rate files with in chunks, for large files. Default: one process per directory)
+                        - output (string, file to write the table of results to. Default: batch_average_rates.csv)""")
+
+else: #note args[0] will be the name of this script
+    out_paths=args[1] #give paths to model output directories
+    species=args[2] #define species to be picked out
+    top_n=int(args[3]) #define number of top reactions to list in output
+    start_t=args[4]
+    end_t=args[5]
+
+if len(args) > 6: #if there are more than 5 arguments then process the kwargs
+    for kwarg in args[6:]:
+        kw,arg=kwarg.split("=",1)
+        if (kw == "workers") or (kw == "parse_workers"): #ints
+            kwarg_dict[kw]=int(arg)
+        elif kw == "output": #strings
+            kwarg_dict[kw]=arg
+        else:
+            raise Exception(f"Unknown key word argument ({kw})")
+
+#convert lists of species to list type
+if "," in species:
+    species=species.split(",")
+
+#expand glob patterns into the list of output directories
+dirs=expand_run_dirs(out_paths)
+
+#analyse each output directory in parallel
+table,errors=batch_average_rates(dirs, species=species, top_n=top_n,
+                                 start_t=start_t, end_t=end_t,
+                                 n_workers=kwarg_dict["workers"],
+                                 parse_workers=kwarg_dict["parse_workers"])
+
+#write table of results (a row for each top reaction of each species of each 
+#run)
+table.to_csv(kwarg_dict["output"], index=False)
+print(f"Analysed {len(dirs)-len(errors)} of {len(dirs)} run(s), results written to {kwarg_dict['output']}")
+
+#list runs that failed
+for out_path,error in errors.items():
+    print(f"FAILED {out_path}: {error}")
@@ -0,0 +1,52 @@
+"""Script to compare the average production and loss rates of each reaction
+of species between two AtChem2 model runs (e.g. a base and a perturbed 
+scenario), with reactions matched by their equation"""
+#imports
+from read_output.rate_dataset import read_rate_dataset
+from read_output.ropa import compare_average_rates
+import sys
+
+#put command-line args into list
+args=sys.argv
+
+if len(args)<7: #if not enough args provided
+        raise Exception("""Requred arguments are (in this order): 
+                        - path to base model output directory
+                        - path to perturbed model output directory
+                        - species of interest (list separated by commas or "ALL") 
+                        - top 'n' changes to list (e.g. '10' for the 10 largest changes in production and loss)
+                        - start point (in model time) for averaging over, or "START" 
+                        - end point (in model time) for averaging over, or "END" """)
+
+else: #note args[0] will be the name of this script
+    base_path=args[1] #give paths to model output directories
+    perturbed_path=args[2]
+    species=args[3] #define species to be picked out
+    top_n=int(args[4]) #define number of top changes to list in output
+    start_t=args[5]
+    end_t=args[6]
+
+#convert lists of species to list type
+if "," in species:
+    species=species.split(",")
+
+#read production and loss rates of each run
+base=read_rate_dataset(base_path)
+perturbed=read_rate_dataset(perturbed_path)
+
+#compare average rates of each reaction (sorted by the size of the change)
+table=compare_average_rates(base, perturbed, species=species, start_t=start_t,
+                            end_t=end_t)
+table.to_csv("rate_comparison.csv", index=False)
+
+#print the largest changes
+print("-"*10)
+print(f"Showing top {top_n} change(s) (perturbed-base)")
+print("-"*10)
+for kind in ["production","loss"]:
+    print(kind.upper())
+    print()
+    for row in table[table["type"]==kind].head(top_n).itertuples():
+        print(f"{row.species} {row.reaction}: change= {row.change:.3e} molecule cm-3 s-1 ({row.relative_change*100:.3g}%, {row.rate_base:.3e} -> {row.rate_perturbed:.3e})")
+    print("-"*10)
+print("Full comparison written to rate_comparison.csv")
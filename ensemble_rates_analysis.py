@@ -0,0 +1,46 @@
+"""Script to calculate the mean, standard deviation and percentiles across an
+ensemble of AtChem2 model runs of the production and loss rate of each 
+reaction of species at each timestep"""
+#imports
+from read_output.ensemble import ensemble_rate_stats
+from read_output.ropa import expand_run_dirs
+import pandas as pd
+import sys
+
+#put command-line args into list
+args=sys.argv
+
+if len(args)<3: #if not enough args provided
+        raise Exception("""Requred arguments are (in this order): 
+                        - paths to model output directories (list separated by commas, each of which can be a glob pattern e.g. "runs/*/output")
+                        - species of interest (list separated by commas or "ALL")
+                        - (optional) percentiles to calculate (list separated by commas, e.g. 5,50,95, or "NONE". Default: 5,50,95)""")
+
+else: #note args[0] will be the name of this script
+    out_paths=args[1] #give paths to model output directories
+    species=args[2] #define species to be picked out
+    if len(args) > 3 and args[3] != "NONE":
+        percentiles=[float(q) for q in args[3].split(",")]
+    elif len(args) > 3:
+        percentiles=None
+    else:
+        percentiles=[5,50,95]
+
+#convert lists of species to list type
+if species!="ALL":
+    species=species.split(",")
+
+#expand glob patterns into the list of output directories
+dirs=expand_run_dirs(out_paths)
+
+#calculate statistics of production and loss rates (reading one run at a 
+#time) and output to files with a row for each reaction of each species and 
+#a column for each timestep
+for side,name in [(1,"production"),(0,"loss")]:
+    stats=ensemble_rate_stats(dirs, side, species=species, 
+                              percentiles=percentiles)
+    for stat in ["mean","std"]+[f"p{q:g}" for q in percentiles or []]:
+        pd.DataFrame(stats[stat], index=stats["pairs"], 
+                     columns=stats["times"]).to_csv(
+                         f"ensemble_{name}_{stat}.csv")
+    print(f"{name}: {len(stats['pairs'])} reaction(s) of {stats['n']} run(s)")
@@ -0,0 +1,111 @@
+#imports
+import numpy as np
+
+#number of timesteps in each block of the block summaries
+BLOCK_SIZE=100
+
+#names of the block summaries
+SUMMARIES=["sum","integral","max","min"]
+
+def _interval_integrals(times, rates):
+    """Function to calculate the integral (trapezium rule) of the rates over
+    each interval between consecutive timesteps, with missing rates as 0"""
+    rates=np.nan_to_num(rates)
+    return np.diff(times)*(rates[:,:-1]+rates[:,1:])/2
+
+def block_summaries(times, rates, block_size=BLOCK_SIZE):
+    """Function to summarise an array of rates [pair, time] in blocks of
+    "block_size" timesteps. Returns a dictionary of arrays [pair, block] of
+    the sum, maximum and minimum of the rates in each block, and the
+    integral over time of the intervals starting in each block (missing
+    rates are taken as 0 in the sums and integrals, and ignored in the
+    maxima and minima)"""
+    n_blocks=-(-len(times)//block_size)
+    starts=np.arange(n_blocks)*block_size
+    summaries={"block_size":block_size}
+    if n_blocks == 0 or len(rates) == 0:
+        for name in SUMMARIES:
+            summaries[name]=np.zeros((len(rates),n_blocks))
+        return summaries
+
+    summaries["sum"]=np.add.reduceat(np.nan_to_num(rates), starts, axis=1)
+    summaries["max"]=np.fmax.reduceat(rates, starts, axis=1)
+    summaries["min"]=np.fmin.reduceat(rates, starts, axis=1)
+
+    #intervals starting in the last timestep don't exist
+    integrals=_interval_integrals(times, rates)
+    summaries["integral"]=np.zeros((len(rates),n_blocks))
+    full=starts < len(times)-1
+    if np.any(full):
+        summaries["integral"][:,full]=np.add.reduceat(integrals, starts[full],
+                                                      axis=1)
+
+    return summaries
+
+def select_summary_rows(summaries, rows):
+    """Function to select rows (pairs) of block summaries"""
+    if summaries is None:
+        return None
+    return {name:(arr if name == "block_size" else arr[rows])
+            for name,arr in summaries.items()}
+
+def _window_blocks(start, stop, block_size):
+    """Function to split the timestep indexes start:stop into the whole
+    blocks (first and last block index) they cover, and the ranges at each
+    end outside of those blocks"""
+    first=-(-start//block_size)
+    last=stop//block_size
+    if first >= last: #no whole blocks
+        return first, first, [(start,stop)]
+    return first, last, [(start,first*block_size),(last*block_size,stop)]
+
+def window_stats(times, rates, summaries, windows):
+    """Function to calculate the mean, sum, integral over time (trapezium
+    rule), maximum and minimum of each row of an array of rates [pair, time]
+    over each of a list of "windows" (slices of contiguous timestep indexes,
+    e.g. slice(0,24)), using block summaries (from block_summaries) so only
+    the timesteps at the ends of each window outside of whole blocks are
+    read. Returns a dictionary of arrays [pair, window] (missing rates are
+    taken as 0 in the mean, sum and integral)"""
+    block_size=summaries["block_size"]
+    stats={name:np.zeros((len(rates),len(windows))) for name in
+           ["mean"]+SUMMARIES}
+
+    for w,window in enumerate(windows):
+        start,stop,step=window.indices(len(times))
+        if step != 1:
+            raise ValueError("Windows of timesteps must be contiguous")
+        stop=max(start,stop)
+
+        #sums, maxima and minima of the rates at timesteps start:stop
+        first,last,edges=_window_blocks(start, stop, block_size)
+        total=summaries["sum"][:,first:last].sum(axis=1)
+        parts_max=[summaries["max"][:,first:last]]
+        parts_min=[summaries["min"][:,first:last]]
+        for a,b in edges:
+            total=total+np.nan_to_num(rates[:,a:b]).sum(axis=1)
+            parts_max.append(rates[:,a:b])
+            parts_min.append(rates[:,a:b])
+        stats["sum"][:,w]=total
+        stats["mean"][:,w]=total/(stop-start) if stop > start else np.nan
+        with np.errstate(invalid="ignore"):
+            stats["max"][:,w]=np.fmax.reduce(np.hstack(parts_max), axis=1,
+                                             initial=-np.inf)
+            stats["min"][:,w]=np.fmin.reduce(np.hstack(parts_min), axis=1,
+                                             initial=np.inf)
+
+        #integral over the intervals start:stop-1 (between the timesteps of
+        #the window)
+        first,last,edges=_window_blocks(start, max(start,stop-1), block_size)
+        total=summaries["integral"][:,first:last].sum(axis=1)
+        for a,b in edges:
+            if b > a:
+                total=total+_interval_integrals(times[a:b+1],
+                                                rates[:,a:b+1]).sum(axis=1)
+        stats["integral"][:,w]=total
+
+    #windows without any (non-missing) rates have no maximum or minimum
+    stats["max"][np.isneginf(stats["max"])]=np.nan
+    stats["min"][np.isposinf(stats["min"])]=np.nan
+
+    return stats
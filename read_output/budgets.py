@@ -0,0 +1,55 @@
+#imports
+import numpy as np
+
+def align_times(times, other_times):
+    """Function to find the index in "other_times" (e.g. the timesteps of the
+    concentration output) of each of "times", raising a ValueError if any of
+    them are missing (times must match exactly, as both are read from the
+    same model timesteps)"""
+    other_times=np.asarray(other_times)
+    index=np.searchsorted(other_times, times)
+    index=np.minimum(index, len(other_times)-1)
+    if len(other_times) == 0 or np.any(other_times[index] != times):
+        raise ValueError("Timesteps of rates are missing from concentrations")
+
+    return index
+
+def species_budget(production, loss, conc_times=None, conc_species=None,
+                   concs=None):
+    """Function to calculate the budget of every species in RateTensors of
+    production and loss rates at once. Returns a dictionary of the species
+    names, times, and arrays [species, time] of the total production, total
+    loss and net rate (production-loss) in molecule cm-3 s-1. If the
+    concentration output is given (times, species names and an array
+    [time, species]) then the concentrations are aligned to the rates by
+    timestep index, and the net rate divided by concentration ("net_s-1"),
+    the first-order loss frequency (s-1) and lifetime (s) are also returned
+    (NaN for species without concentrations)"""
+    #species with production and/or loss rates
+    species=list(dict.fromkeys(production.species.tolist()+
+                               loss.species.tolist()))
+    position={s:i for i,s in enumerate(species)}
+
+    budget={"species":species, "times":production.times}
+    for name,tensor in [("production",production),("loss",loss)]:
+        labels,totals=tensor.reduce("reaction")
+        budget[name]=np.zeros((len(species),len(tensor.times)))
+        budget[name][[position[s] for s in labels.tolist()]]=totals
+    budget["net"]=budget["production"]-budget["loss"]
+
+    if concs is not None:
+        #concentrations of each species aligned to the rate timesteps (NaN
+        #for species without concentrations)
+        t_index=align_times(production.times, conc_times)
+        columns={s:i for i,s in enumerate(conc_species)}
+        conc=np.full((len(species),len(t_index)), np.nan)
+        has_conc=[i for i,s in enumerate(species) if s in columns]
+        conc[has_conc]=np.asarray(concs)[t_index][:,[columns[species[i]]
+                                                       for i in has_conc]].T
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            budget["net_s-1"]=budget["net"]/conc
+            budget["loss_frequency"]=budget["loss"]/conc
+            budget["lifetime"]=conc/budget["loss"]
+
+    return budget
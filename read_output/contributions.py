@@ -0,0 +1,48 @@
+#imports
+import numpy as np
+from read_output.rate_tensor import reduce_groups
+
+def contributions(values, indptr, scale=1, dtype=np.float64):
+    """Function to calculate the contribution of each row of an array of
+    rates [pair, time] to the total rate of its species (the groups of rows
+    indptr[i]:indptr[i+1]) at each timestep, with one divide of the array by
+    the totals of each species broadcast to its rows. Contributions are
+    multiplied by "scale" (e.g. 100 for percentages), and are 0 where the
+    total is 0. "dtype" can be np.float32 to halve the memory of the output
+    (e.g. for plotting long runs)"""
+    values=np.asarray(values, dtype=np.float64)
+    indptr=np.asarray(indptr, dtype=np.int64)
+    counts=np.diff(indptr)
+
+    #total rate of each species at each timestep
+    totals=reduce_groups(values, indptr)
+    totals=np.repeat(totals, counts, axis=0)
+
+    fractions=np.zeros(values.shape, dtype=dtype)
+    np.divide(values, totals, out=fractions, where=totals != 0,
+              casting="unsafe")
+    if scale != 1:
+        fractions*=scale
+
+    return fractions
+
+def contribution_dict(rates_dict, scale=1, dtype=np.float64):
+    """Function to calculate the contributions (see contributions) of each
+    reaction of a nested dictionary of rates indexed by species and reaction
+    (e.g. from RateTensor.to_dict, or with "Other" or lumped categories),
+    for all species at once. Returns a dictionary with the same structure of
+    arrays of contributions"""
+    keys=[(s,k) for s in rates_dict for k in rates_dict[s]]
+    if len(keys) == 0:
+        return {s:{} for s in rates_dict}
+    indptr=np.zeros(len(rates_dict)+1, dtype=np.int64)
+    indptr[1:]=np.cumsum([len(rates_dict[s]) for s in rates_dict])
+    values=np.array([rates_dict[s][k] for s,k in keys], dtype=np.float64)
+
+    fractions=contributions(values, indptr, scale, dtype)
+
+    contribution_rates={s:{} for s in rates_dict}
+    for (s,k),row in zip(keys,fractions):
+        contribution_rates[s][k]=row
+
+    return contribution_rates
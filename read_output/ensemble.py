@@ -0,0 +1,108 @@
+#imports
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from read_output.rate_dataset import read_rate_dataset
+from read_output.ropa import sum_by_equation
+
+def _equation_rates(rate_data, side, species):
+    """Function to produce a DataFrame of the rates [pair, time] of a
+    RateDataset (production if side is 1, loss if 0) indexed by species and
+    reaction equation (summing reactions with the same equation), so runs
+    with different reactionNumbers can be matched"""
+    if side == 1:
+        tensor=rate_data.p_rate_tensor(species=species,
+                                       error_for_non_species=False)
+    else:
+        tensor=rate_data.l_rate_tensor(species=species,
+                                       error_for_non_species=False)
+
+    #pairs missing from a timestep have no rate
+    return sum_by_equation(tensor, np.nan_to_num(tensor.values), tensor.times)
+
+def _ensemble_index(out_paths, side, species):
+    """Function to find the species/reaction pairs of any run and the
+    timesteps of every run of an ensemble, reading one run at a time"""
+    pairs={}
+    times=None
+    for out_path in out_paths:
+        rates=_equation_rates(read_rate_dataset(out_path), side, species)
+        pairs.update(dict.fromkeys(rates.index))
+        times=(rates.columns.to_numpy() if times is None else
+               np.intersect1d(times, rates.columns.to_numpy()))
+
+    return pd.MultiIndex.from_tuples(list(pairs), names=["species",
+                                                         "reaction"]), times
+
+def ensemble_rate_stats(out_paths, side, species="ALL", percentiles=None,
+                        stack_path=None, block_bytes=2**28):
+    """Function to calculate the mean and standard deviation (and
+    optionally percentiles) across the runs of an ensemble (a list of AtChem2
+    output directories) of the production (side=1) or loss (side=0) rate of
+    each species/reaction pair at each timestep. Reactions are matched by
+    equation, pairs missing from a run have a rate of 0, and only the
+    timesteps of every run are used. Runs are read one at a time and the
+    moments are accumulated with Welford's algorithm, so memory use doesn't
+    depend on the number of runs. For exact "percentiles" (e.g. [5,50,95])
+    the aligned rates of each run are stacked in a memory-mapped file
+    ("stack_path", or a temporary file) and reduced in blocks of pairs of
+    about "block_bytes" bytes. Returns a dictionary of the pairs (a
+    MultiIndex of species and reaction), times, number of runs and arrays
+    [pair, time] of the "mean", "std" (sample standard deviation) and each
+    percentile (e.g. "p5")"""
+    if len(out_paths) == 0:
+        raise ValueError("No runs in the ensemble")
+    pairs,times=_ensemble_index(out_paths, side, species)
+    shape=(len(pairs),len(times))
+
+    temporary=percentiles is not None and stack_path is None
+    if temporary:
+        file,stack_path=tempfile.mkstemp(suffix=".npy")
+        os.close(file)
+    try:
+        if percentiles is not None:
+            stack=np.lib.format.open_memmap(stack_path, mode="w+",
+                                            dtype=np.float64,
+                                            shape=(len(out_paths),)+shape)
+
+        #running count, mean and sum of squared differences from the mean
+        n=0
+        mean=np.zeros(shape)
+        m2=np.zeros(shape)
+        for i,out_path in enumerate(out_paths):
+            rates=_equation_rates(read_rate_dataset(out_path), side, species)
+            rates=rates.reindex(index=pairs, columns=times,
+                                fill_value=0.0).to_numpy()
+
+            n+=1
+            delta=rates-mean
+            mean+=delta/n
+            m2+=delta*(rates-mean)
+
+            if percentiles is not None:
+                stack[i]=rates
+
+        stats={"pairs":pairs, "times":times, "n":n, "mean":mean}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stats["std"]=(np.sqrt(m2/(n-1)) if n > 1 else
+                          np.full(shape, np.nan))
+
+        if percentiles is not None:
+            stack.flush()
+            for q in percentiles:
+                stats[f"p{q:g}"]=np.empty(shape)
+            #number of pairs in each block of the stack
+            step=max(1, block_bytes//max(1,len(out_paths)*len(times)*8))
+            for a in range(0,len(pairs),step):
+                values=np.percentile(stack[:,a:a+step], percentiles, axis=0)
+                for q,v in zip(percentiles,values):
+                    stats[f"p{q:g}"][a:a+step]=v
+            del stack
+    finally:
+        #remove the temporary stack, even if reading a run failed
+        if temporary:
+            stack=None #close the memory map first
+            os.remove(stack_path)
+
+    return stats
@@ -0,0 +1,112 @@
+#imports
+import os
+import configparser
+import numpy as np
+from read_output.reaction_index import split_reactions
+from read_output.rate_tensor import RateTensor
+
+#file of chemical family definitions used by default
+FAMILY_FILE=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "families.cfg")
+
+def read_families(path=FAMILY_FILE):
+    """Function to read a config file of chemical families into a dictionary
+    of the weight of each member species indexed by family name. Each section
+    of the file is a family, with a "species = weight" line for each 
+    member"""
+    config=configparser.ConfigParser()
+    config.optionxform=str #species names are case sensitive
+    with open(path,"r") as file:
+        config.read_file(file)
+
+    return {f:{s:float(w) for s,w in config[f].items()} 
+            for f in config.sections()}
+
+def load_families(families=None):
+    """Function to return a dictionary of families from the "families" input
+    of the rate functions, which can be a dictionary of families, the path of
+    a config file, or None for the default families"""
+    if families is None:
+        return read_families()
+    elif type(families)==str:
+        return read_families(families)
+    elif type(families)==dict:
+        return families
+    else:
+        raise TypeError("""families must be a dictionary of families, the path
+                        to a family config file, or None for the default
+                        families""")
+
+def family_weights(reactions, families, side):
+    """Function to produce the array of family weights of each reaction (rows
+    are reactions, columns are families) from a dictionary of reaction 
+    definitions. The weight of a reaction is the sum of the weights of the 
+    family members amongst its products (side=1) or reactants (side=0), with
+    each species counted once as AtChem2 rates already include the 
+    stoichiometry. Returns the family names, reactionNumbers and weights"""
+    names=list(families)
+    numbers=list(reactions)
+    weights=np.zeros((len(numbers),len(names)))
+
+    #index the families (column and weight) each species is a member of
+    members={}
+    for j,f in enumerate(names):
+        for s,w in families[f].items():
+            members.setdefault(s,[]).append((j,w))
+
+    split=split_reactions(reactions)
+    for i,r in enumerate(numbers):
+        for s in set(split[r][side]):
+            for j,w in members.get(s,[]):
+                weights[i,j]+=w
+
+    return names, numbers, weights
+
+def reaction_rate_array(pair_reactions, rates, numbers):
+    """Function to produce an array of the rate of each reaction in "numbers"
+    (rows) at each timestep from a rate array with a row for each 
+    species/reaction pair (see rate_array). The rate of a reaction is taken
+    from the last row it appears in (they should be the same for each 
+    species), and is zero for reactions without any rows"""
+    #position of the last row of each reactionNumber
+    reversed_numbers=np.asarray(pair_reactions)[::-1]
+    keys,last=np.unique(reversed_numbers, return_index=True)
+    last=len(reversed_numbers)-1-last
+
+    numbers=np.asarray(numbers)
+    pos=np.searchsorted(keys, numbers)
+    found=(pos < len(keys)) & (keys[np.minimum(pos,len(keys)-1)] == numbers)
+
+    reaction_rates=np.zeros((len(numbers),rates.shape[1]))
+    reaction_rates[found]=rates[last[pos[found]]]
+
+    return reaction_rates
+
+def family_rate_tensor(tensor, name, family, side):
+    """Function to produce the rates of each reaction producing (side=1) or
+    removing (side=0) a family, weighted by the family members involved, from
+    a RateTensor. "family" is the dictionary of member species weights. 
+    Returns a RateTensor with a single species ("name") and a row for each 
+    reaction, in order of first appearance"""
+    numbers,first=np.unique(tensor.reaction_numbers, return_index=True)
+    numbers=numbers[np.argsort(first, kind="stable")]
+    
+    names,numbers,weights=family_weights({r:tensor.reactions[r] for r in 
+                                          numbers.tolist()},
+                                         {name:family}, side)
+    values=reaction_rate_array(tensor.reaction_numbers, tensor.values, 
+                               numbers)*weights
+
+    return RateTensor(tensor.times, [name], [0,len(numbers)], numbers,
+                      values, tensor.reactions)
+
+def family_totals(pair_reactions, rates, reactions, families, side):
+    """Function to calculate the total production (side=1) or loss (side=0) 
+    rate of each family at each timestep from a rate array with a row for 
+    each species/reaction pair (see rate_array), using a single product of 
+    the reaction rates with the reaction/family weight matrix. Returns a
+    dictionary of the total rates indexed by family"""
+    names,numbers,weights=family_weights(reactions, families, side)
+    totals=weights.T@reaction_rate_array(pair_reactions, rates, numbers)
+
+    return dict(zip(names,totals))
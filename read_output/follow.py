@@ -0,0 +1,226 @@
+#imports
+import os
+import mmap
+import numpy as np
+import pandas as pd
+from read_output.read_rate_output import (_line_time, _parse_rate_range,
+                                          _merge_rate_columns, _species_filter)
+from read_output.families import load_families
+from read_output.rate_tensor import RateTensor
+from read_output.rate_dataset import RateDataset
+
+def _last_timestep_start(mm, start, end):
+    """Function to find the byte the last timestep between bytes "start" and
+    "end" (the end of a line) of a memory-mapped rate output file starts at,
+    by bisecting the lines (which are ordered by time)"""
+    last=mm.rfind(b"\n", start, end-1)+1 or start #start of the last line
+    last_time=_line_time(mm, last)[0]
+    if _line_time(mm, start)[0] == last_time:
+        return start
+
+    #time of the line at "a" is before last_time, at "b" it is last_time
+    a,b=start,last
+    while True:
+        mid=mm.find(b"\n", (a+b)//2, b)+1
+        if mid <= a or mid >= b:
+            mid=_line_time(mm, a)[1]
+        if mid >= b:
+            return b
+        if _line_time(mm, mid)[0] == last_time:
+            b=mid
+        else:
+            a=mid
+
+#columns of typed columns with a value for each line
+LINE_COLUMNS=["time","speciesNumber","speciesId","reactionNumber","rate"]
+
+def _select_lines(cols, mask):
+    """Function to select the lines of typed columns (from RateFollower.poll)
+    where the boolean array "mask" is True"""
+    return {c:(v[mask] if c in LINE_COLUMNS else v) for c,v in cols.items()}
+
+class RateFollower:
+    """Class to follow an AtChem2 rate output file that is still being
+    written by a running model. Each poll only parses the timesteps appended
+    since the last poll (from the byte offset it reached), and the last
+    timestep in the file is held back until a later one starts, as it may
+    not be complete"""
+
+    def __init__(self, out_path, species=None):
+        self.out_path=out_path
+        self.species=species #list of species whose lines are parsed
+        self.offset=None #byte the next timestep to parse starts at
+        self.time=None #time of the last timestep parsed
+
+    def poll(self, final=False):
+        """Function to parse the complete timesteps appended to the file since
+        the last poll into typed columns (as read_rate_columns), returning
+        None if there aren't any. If "final" is True (i.e. the model has
+        finished) then the last timestep is also parsed"""
+        size=os.path.getsize(self.out_path)
+        if self.offset is not None and size < self.offset:
+            raise ValueError(f"{self.out_path} has been truncated")
+        if size == 0 or size == self.offset:
+            return None
+
+        with open(self.out_path,"rb") as file, mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if self.offset is None: #skip first header line, once written
+                header_end=mm.find(b"\n")
+                if header_end == -1:
+                    return None
+                self.offset=header_end+1
+
+            #only parse complete lines (and complete timesteps)
+            end=len(mm) if final else mm.rfind(b"\n", self.offset)+1
+            if end <= self.offset:
+                return None
+            if not final:
+                end=_last_timestep_start(mm, self.offset, end)
+            if end <= self.offset:
+                return None
+            self.time=_line_time(mm, mm.rfind(b"\n", self.offset, end-1)+1
+                                 or self.offset)[0]
+
+        cols=_parse_rate_range(self.out_path, self.offset, end,
+                               species=self.species)
+        self.offset=end
+
+        return cols
+
+class RunningRates:
+    """Class holding the running sum of the rate of each species/reaction
+    pair of a rate output file over the timesteps between "start"
+    (inclusive) and "end" (exclusive) in model time (None for no limit), so
+    the average rates can be updated as timesteps are parsed"""
+
+    def __init__(self, start=None, end=None):
+        self.start=start
+        self.end=end
+        self.pairs={} #row of each (speciesName, reactionNumber) pair
+        self.sums=np.zeros(0) #sum of rates of each pair
+        self.times=[] #timesteps summed
+        self.reactions={} #dictionary of reaction definitions by reactionNumber
+
+    def update(self, cols):
+        """Function to add the rates of typed columns (from
+        RateFollower.poll) in the window of times to the running sums"""
+        self.reactions.update(cols["reactions"])
+        in_window=np.ones(len(cols["time"]), dtype=bool)
+        if self.start is not None:
+            in_window&=cols["time"] >= self.start
+        if self.end is not None:
+            in_window&=cols["time"] < self.end
+        if not np.any(in_window):
+            return
+
+        #find the row of each unique pair of the new lines, adding new pairs
+        #in order of their first appearance in the file
+        n_r=int(cols["reactionNumber"].max())+1
+        key=(cols["speciesId"][in_window].astype(np.int64)*n_r+
+             cols["reactionNumber"][in_window])
+        keys,first,inverse=np.unique(key, return_index=True,
+                                     return_inverse=True)
+        rows=np.empty(len(keys), dtype=np.int64)
+        for i in np.argsort(first, kind="stable").tolist():
+            pair=(str(cols["speciesNames"][keys[i]//n_r]),int(keys[i]%n_r))
+            rows[i]=self.pairs.setdefault(pair,len(self.pairs))
+
+        self.sums=np.append(self.sums, np.zeros(len(self.pairs)-
+                                                len(self.sums)))
+        self.sums+=np.bincount(rows[inverse], weights=cols["rate"][in_window],
+                               minlength=len(self.pairs))
+        self.times.extend(np.unique(cols["time"][in_window]).tolist())
+
+    def tensor(self):
+        """Function to produce a RateTensor with a single column of the
+        average rate of each pair (at the last timestep summed)"""
+        pair_species=[s for s,r in self.pairs]
+        reaction_numbers=np.array([r for s,r in self.pairs], dtype=np.int64)
+        averages=self.sums/max(len(self.times),1)
+
+        return RateTensor.from_pairs(np.array(self.times[-1:]), pair_species,
+                                     reaction_numbers, averages[:,None],
+                                     self.reactions)
+
+class RateMonitor:
+    """Class to follow the production and loss rate output files of a model
+    that is still running, keeping the running average rates over a window
+    of model times ("start" inclusive, "end" exclusive, None for no limit)
+    of "species" (a list of species, a species or family, or "ALL"). Only
+    the timesteps parsed from both files are averaged, so the production and
+    loss rates always cover the same timesteps"""
+
+    def __init__(self, out_path, start=None, end=None, species="ALL",
+                 families=None):
+        #only parse the lines of the species of interest (or all lines for
+        #families, whose members are needed)
+        parse=_species_filter(species, load_families(families))
+        self.followers=[RateFollower(out_path+"/productionRates.output",
+                                     species=parse),
+                        RateFollower(out_path+"/lossRates.output",
+                                     species=parse)]
+        self.running=[RunningRates(start, end), RunningRates(start, end)]
+        self.pending=[None,None] #lines parsed but not yet averaged
+        self.end=end
+
+    def update(self, final=False):
+        """Function to parse new complete timesteps of both files and update
+        the running averages with the timesteps parsed from both. If "final"
+        is True (i.e. the model has finished) then the last timestep is also
+        parsed, unless there is no end time, as "END" excludes the last
+        timestep (see time_window). Returns True if there were new 
+        timesteps"""
+        for i,follower in enumerate(self.followers):
+            cols=follower.poll(final=final and self.end is not None)
+            if cols is not None:
+                self.pending[i]=(cols if self.pending[i] is None else
+                                 _merge_rate_columns([self.pending[i],cols]))
+
+        #average the timesteps up to the last timestep parsed from both files
+        if None in [follower.time for follower in self.followers]:
+            return False
+        last_time=min(follower.time for follower in self.followers)
+        updated=False
+        for i,running in enumerate(self.running):
+            if self.pending[i] is None:
+                continue
+            new=self.pending[i]["time"] <= last_time
+            if np.any(new):
+                running.update(_select_lines(self.pending[i], new))
+                updated=True
+            self.pending[i]=(_select_lines(self.pending[i], ~new) if
+                             not np.all(new) else None)
+
+        return updated
+
+    def dataset(self):
+        """Function to produce a RateDataset of the average rates so far, with
+        a single timestep (see RunningRates.tensor)"""
+        production,loss=[running.tensor() for running in self.running]
+
+        return RateDataset(production.times, production, loss)
+
+    def budgets(self, species="ALL"):
+        """Function to calculate the running budget of each of "species" (as
+        for RateDataset.p_rate_tensor, including families) from the average
+        rates so far: the total production and loss rate and the net rate
+        (production-loss). Returns a DataFrame indexed by species"""
+        rate_data=self.dataset()
+        totals={}
+        for name,tensor in [("production",rate_data.p_rate_tensor(
+                                species=species, error_for_non_species=False)),
+                            ("loss",rate_data.l_rate_tensor(
+                                species=species, error_for_non_species=False))]:
+            names,total=tensor.reduce("reaction")
+            totals[name]=pd.Series(total[:,-1] if total.shape[1] else np.nan,
+                                   index=names, dtype=np.float64)
+        budget=pd.DataFrame(totals).fillna(0.0)
+        budget["net"]=budget["production"]-budget["loss"]
+
+        return budget
+
+    @property
+    def times(self):
+        """List of the timesteps averaged in the production rate file"""
+        return self.running[0].times
@@ -0,0 +1,129 @@
+#imports
+import re
+import configparser
+import numpy as np
+from read_output.families import FAMILY_FILE
+from read_output.reaction_index import split_reactions, lookup_equations
+from read_output.rate_tensor import reduce_groups
+
+def read_classes(path=FAMILY_FILE):
+    """Function to read a config file of classes of species (e.g. RO2) into
+    a dictionary of the list of member species indexed by class name. Each
+    section of the file is a class, with a line for each member (any value
+    after the species name, e.g. a family weight, is ignored)"""
+    config=configparser.ConfigParser(allow_no_value=True)
+    config.optionxform=str #species names are case sensitive
+    with open(path,"r") as file:
+        config.read_file(file)
+
+    return {c:list(config[c]) for c in config.sections()}
+
+def load_classes(classes=None):
+    """Function to return a dictionary of classes of species from the
+    "classes" input of the lumping functions, which can be a dictionary of
+    lists of species, the path of a config file, or None. The families in
+    read_output/families.cfg are always included as classes"""
+    if classes is None:
+        return read_classes()
+    elif type(classes)==str:
+        return {**read_classes(), **read_classes(classes)}
+    elif type(classes)==dict:
+        return {**read_classes(), **{c:list(m) for c,m in classes.items()}}
+    else:
+        raise TypeError("""classes must be a dictionary of lists of species,
+                        the path to a class config file, or None""")
+
+def _terms_match(terms, species, classes):
+    """Function to check whether a list of species (the reactants or products
+    of a reaction) matches a list of terms in any order, where each term is a
+    species name, a class name (matching any member) or "*" (matching any
+    species)"""
+    if len(terms) != len(species):
+        return False
+    if not terms:
+        return True
+
+    term=terms[0]
+    for i,s in enumerate(species):
+        if term == "*" or term == s or s in classes.get(term,()):
+            if _terms_match(terms[1:], species[:i]+species[i+1:], classes):
+                return True
+
+    return False
+
+def rule_reactions(rule, reactions, index, classes):
+    """Function to find the reactionNumbers matched by a lumping rule, which
+    can be:
+        - a reaction equation, e.g. "NO2+O3=NO3"
+        - "regex:" followed by a regular expression searched for in each
+          equation, e.g. "regex:=.*HNO3"
+        - "reactants:" or "products:" followed by species, classes (e.g.
+          RO2) or "*" (any species) joined by "+", matching reactions with
+          exactly those reactants/products in any order, e.g.
+          "reactants:RO2+NO"
+    "index" is the equation index of the reactions (from equation_index)"""
+    if rule.startswith("regex:"):
+        pattern=re.compile(rule[len("regex:"):])
+        return [r for r,eq in reactions.items() if pattern.search(eq)]
+
+    for side,prefix in [(0,"reactants:"),(1,"products:")]:
+        if rule.startswith(prefix):
+            terms=rule[len(prefix):].split("+")
+            return [r for r,split in split_reactions(reactions).items()
+                    if _terms_match(terms, split[side], classes)]
+
+    return lookup_equations(index, [rule])
+
+def lump_index(tensor, lumps, classes=None):
+    """Function to compile a dictionary of lumps, {species: {category:
+    rules}} where rules is a lumping rule or list of rules (see
+    rule_reactions), into the rows of a RateTensor in each category of each
+    species: the rows of that species whose reaction is matched by any of 
+    the category's rules (so reactions matched by several rules are only 
+    included once). Returns the list of (species, category) of each 
+    category, the array of rows of all the categories, and the index (indptr)
+    of the first row of each category"""
+    classes=load_classes(classes)
+    matches={} #reactionNumbers of each rule, found once
+    labels=[]
+    rows=[]
+    for s in lumps:
+        i=np.flatnonzero(tensor.species == s)
+        species_rows=(np.arange(tensor.indptr[i[0]],tensor.indptr[i[0]+1])
+                      if len(i) else np.array([], dtype=np.int64))
+        species_reactions=tensor.reaction_numbers[species_rows]
+        for category,rules in lumps[s].items():
+            if type(rules)==str:
+                rules=[rules]
+            numbers=[]
+            for rule in rules:
+                if rule not in matches:
+                    matches[rule]=rule_reactions(rule, tensor.reactions,
+                                                 tensor.equation_index,
+                                                 classes)
+                numbers+=matches[rule]
+
+            #set of reactions matched by any of the rules
+            numbers=np.unique(np.array(numbers, dtype=np.int64))
+            rows.append(species_rows[np.isin(species_reactions, numbers)])
+            labels.append((s,category))
+
+    indptr=np.zeros(len(rows)+1, dtype=np.int64)
+    indptr[1:]=np.cumsum([len(r) for r in rows])
+    rows=np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+
+    return labels, rows, indptr
+
+def lump_rates(tensor, lumps, classes=None):
+    """Function to lump the rates of a RateTensor into categories of
+    reactions for each species (see lump_index), summing the rows of every
+    category in one grouped reduction of the rate array. Returns a nested
+    dictionary of the summed rates indexed by species and category"""
+    labels,rows,indptr=lump_index(tensor, lumps, classes)
+    lumped=reduce_groups(np.asarray(tensor.values)[rows], indptr)
+
+    lumped_rates={}
+    for (s,category),rates in zip(labels,lumped):
+        lumped_rates.setdefault(s,{})[category]=rates
+
+    return lumped_rates
@@ -0,0 +1,89 @@
+#imports
+import warnings
+import numpy as np
+from read_output.block_summary import _interval_integrals, select_summary_rows
+from read_output.rate_tensor import RateTensor, reduce_groups
+
+#metrics the reactions of each species can be ranked by
+METRICS=["median","mean","max","integral","abs_net"]
+
+def rank_scores(times, values, metric="median"):
+    """Function to calculate the score of each row of an array of rates
+    [pair, time] used to rank the reactions of a species: the "median",
+    "mean" or "max" of the rates over time (ignoring missing rates), the
+    "integral" over time (trapezium rule, missing rates as 0), or "abs_net",
+    the size of the mean rate (for net rates, which can be negative)"""
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+    if values.shape[1] == 0:
+        return np.full(len(values), np.nan)
+
+    with warnings.catch_warnings(): #rows without any rates score nan
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if metric == "median":
+            return np.nanmedian(values, axis=1)
+        elif metric == "mean":
+            return np.nanmean(values, axis=1)
+        elif metric == "max":
+            return np.nanmax(values, axis=1)
+        elif metric == "integral":
+            return _interval_integrals(np.asarray(times, dtype=np.float64),
+                                       values).sum(axis=1)
+        else:
+            return np.abs(np.nanmean(values, axis=1))
+
+def rank_rows(scores, indptr, top_n=None):
+    """Function to rank the rows of each species (the groups of rows
+    indptr[i]:indptr[i+1]) by descending score, keeping only the top "top_n"
+    of each species if given. The top rows are found with a partial sort
+    (np.partition), so only they are fully sorted. Rows with equal scores
+    keep their order (including at the cut-off of the top rows) and rows 
+    scored nan are ranked last. Returns the array
+    of ranked rows and the index (indptr) of the first ranked row of each
+    species"""
+    keys=-np.where(np.isnan(scores), -np.inf, scores)
+    ranked=[]
+    for a,b in zip(indptr[:-1].tolist(),indptr[1:].tolist()):
+        k=b-a if top_n is None else min(max(top_n,0),b-a)
+        if k == 0:
+            ranked.append(np.array([], dtype=np.int64))
+            continue
+        if k == b-a:
+            rows=np.arange(k)
+        else:
+            #rows scoring above the k-th score, and the first of the rows tied
+            #with it (argpartition doesn't keep the order of tied rows)
+            kth=np.partition(keys[a:b], k-1)[k-1]
+            above=np.flatnonzero(keys[a:b] < kth)
+            tied=np.flatnonzero(keys[a:b] == kth)[:k-len(above)]
+            rows=np.sort(np.concatenate([above,tied]))
+        ranked.append(a+rows[np.argsort(keys[a+rows], kind="stable")])
+
+    counts=[len(rows) for rows in ranked]
+    ranked_indptr=np.zeros(len(counts)+1, dtype=np.int64)
+    ranked_indptr[1:]=np.cumsum(counts)
+    rows=np.concatenate(ranked) if ranked else np.array([], dtype=np.int64)
+
+    return rows, ranked_indptr
+
+def top_rates(tensor, top_n, metric="median"):
+    """Function to select the top "top_n" reactions of each species of a
+    RateTensor, ranked by "metric" (see rank_scores), for all species at
+    once. Returns a RateTensor of the top reactions of each species in order
+    of rank, and an array [species, time] of the summed rates of the rest of
+    the reactions of each species ("Other", missing rates as 0)"""
+    scores=rank_scores(tensor.times, tensor.values, metric)
+    rows,indptr=rank_rows(scores, tensor.indptr, top_n)
+    top=RateTensor(tensor.times, tensor.species, indptr,
+                   tensor.reaction_numbers[rows], tensor.values[rows],
+                   tensor.reactions,
+                   select_summary_rows(tensor.summaries, rows))
+
+    #sum the remaining rows of each species in one reduction (rows stay
+    #grouped by species)
+    rest=np.ones(len(tensor), dtype=bool)
+    rest[rows]=False
+    rest_indptr=tensor.indptr-indptr
+    other=reduce_groups(np.nan_to_num(tensor.values[rest]), rest_indptr)
+
+    return top, other
@@ -0,0 +1,206 @@
+#imports
+import os
+import json
+import hashlib
+import tempfile
+import warnings
+import numpy as np
+from read_output.read_rate_output import (read_rate_columns, read_rate_window,
+                                          rate_time_index, rate_array)
+from read_output.block_summary import block_summaries, SUMMARIES
+
+#name of the directory (inside the model output directory) holding the cache
+CACHE_DIR=".ropa_cache"
+
+def _content_hash(path, chunk_size=2**24):
+    """Function to calculate the hash of the contents of a file"""
+    file_hash=hashlib.blake2b()
+    with open(path,"rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+def cache_path(out_path):
+    """Function to return the directory the cache of an AtChem2 output file
+    is stored in"""
+    directory,name=os.path.split(os.path.abspath(out_path))
+    return os.path.join(directory,CACHE_DIR,name)
+
+def _read_key(directory):
+    """Function to read the key (size, mtime and hash of the source file) of
+    the cache in "directory", returning None if there isn't a complete cache"""
+    try:
+        with open(os.path.join(directory,"key.json"),"r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _cache_is_valid(out_path, directory):
+    """Function to check whether the cache in "directory" matches the current
+    state of the file it was made from. The contents are only hashed if the 
+    size matches but the modification time doesn't (e.g. if the file has been
+    copied), in which case the key is updated with the new time"""
+    key=_read_key(directory)
+    if key is None:
+        return False
+
+    stat=os.stat(out_path)
+    if stat.st_size != key["size"]:
+        return False
+    elif stat.st_mtime_ns == key["mtime_ns"]:
+        return True
+    elif _content_hash(out_path) == key["hash"]:
+        key["mtime_ns"]=stat.st_mtime_ns
+        try:
+            _replace_file(os.path.join(directory,"key.json"),
+                          lambda file: file.write(json.dumps(key).encode()))
+        except OSError:
+            pass
+        return True
+    else:
+        return False
+
+def _source_key(out_path):
+    """Function to make the key (size, mtime and hash) of the file a cache is
+    made from. It is made before the file is parsed, so a file that changes
+    while it is being parsed (e.g. a running model) isn't given the key of 
+    its new contents"""
+    stat=os.stat(out_path)
+    return {"size":stat.st_size, "mtime_ns":stat.st_mtime_ns,
+            "hash":_content_hash(out_path)}
+
+def _replace_file(path, write):
+    """Function to write a file by calling write(file) on a temporary file in 
+    the same directory and then renaming it to "path", so other processes 
+    never see (or have memory-mapped) a partly written file"""
+    file,temp_path=tempfile.mkstemp(dir=os.path.dirname(path),
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(file,"wb") as temp:
+            write(temp)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _write_cache(out_path, directory, arrays, key):
+    """Function to write arrays to the cache directory of out_path, with the
+    key of the file they were parsed from (from _source_key). The key is
+    written last so an interrupted write doesn't leave a valid cache, and 
+    isn't written if the file has changed since the key was made"""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        os.remove(os.path.join(directory,"key.json"))
+    except FileNotFoundError:
+        pass
+
+    for name,arr in arrays.items():
+        _replace_file(os.path.join(directory,name+".npy"),
+                      lambda file: np.save(file, arr))
+
+    stat=os.stat(out_path)
+    if stat.st_size != key["size"] or stat.st_mtime_ns != key["mtime_ns"]:
+        warnings.warn(f"{out_path} changed while it was read, so it wasn't "
+                      "cached")
+        return
+    _replace_file(os.path.join(directory,"key.json"),
+                  lambda file: file.write(json.dumps(key).encode()))
+
+def _load_cache(directory, names, mmap=True):
+    """Function to load arrays from a cache directory, memory-mapping them
+    if specified"""
+    mmap_mode="r" if mmap else None
+    return {n:np.load(os.path.join(directory,n+".npy"), mmap_mode=mmap_mode)
+            for n in names}
+
+def _parse_rate_arrays(out_path, window, species, n_workers):
+    """Function to parse the timesteps selected by "window" and the rows of 
+    a list of "species" (or the whole file if both are None) of an AtChem2
+    rate output file into the arrays stored in the cache"""
+    if window is None and species is None:
+        cols=read_rate_columns(out_path, n_workers=n_workers)
+        times=None
+    else:
+        cols=read_rate_window(out_path, window, species=species,
+                              n_workers=n_workers)
+        times=rate_time_index(out_path)[0][window or slice(None)]
+    times,pair_species,pair_reactions,rates=rate_array(cols, times=times)
+
+    return {"times":times, "species":cols["speciesNames"][pair_species],
+            "reaction_numbers":pair_reactions, "rates":rates,
+            "reaction_keys":np.array(list(cols["reactions"].keys()),
+                                     dtype=np.int64),
+            "reaction_eqs":np.array(list(cols["reactions"].values()),
+                                    dtype=str)}
+
+def cached_rate_array(out_path, cache=True, window=None, species=None,
+                      n_workers=None):
+    """Function to read an AtChem2 rate output file into the sorted times,
+    the species name and reactionNumber of each row, the array of rates (see
+    rate_array) and the dictionary of reaction definitions. If "cache" is
+    True then these are loaded from (or on the first read written to) a
+    binary cache next to the file, which is remade if the file changes. If 
+    "window" (a slice of timestep indexes) or a list of "species" is given
+    then only those timesteps/species are returned. If there isn't a valid
+    cache then the whole file is read to write it (and the window/species are
+    selected from it), unless "cache" is False, in which case only the window
+    and species are read from the file. If "n_workers" is more than 1 then 
+    the file is parsed in chunks by a pool of that many processes"""
+    names=["times","species","reaction_numbers","rates","reaction_keys",
+           "reaction_eqs"]
+    directory=cache_path(out_path)
+
+    if cache:
+        if _cache_is_valid(out_path, directory):
+            arrays=_load_cache(directory, names)
+        else:
+            key=_source_key(out_path)
+            arrays=_parse_rate_arrays(out_path, None, None, n_workers)
+            #store block summaries of the rates alongside them (see 
+            #cached_block_summaries)
+            summaries=block_summaries(arrays["times"], arrays["rates"])
+            arrays["block_size"]=np.array(summaries.pop("block_size"))
+            arrays.update({"block_"+n:summaries[n] for n in SUMMARIES})
+            try:
+                _write_cache(out_path, directory, arrays, key)
+            except OSError as error: #e.g. if the output directory is read-only
+                warnings.warn(f"Unable to write cache for {out_path}: {error}")
+
+        if window is not None:
+            arrays["times"]=arrays["times"][window]
+            arrays["rates"]=arrays["rates"][:,window]
+        if species is not None:
+            rows=np.isin(arrays["species"], species)
+            for n in ["species","reaction_numbers","rates"]:
+                arrays[n]=arrays[n][rows]
+    else:
+        arrays=_parse_rate_arrays(out_path, window, species, n_workers)
+
+    reactions=dict(zip(arrays["reaction_keys"].tolist(),
+                       arrays["reaction_eqs"].tolist()))
+
+    return (arrays["times"], arrays["species"], arrays["reaction_numbers"],
+            arrays["rates"], reactions)
+
+def cached_block_summaries(out_path, species=None):
+    """Function to load the block summaries (see 
+    read_output/block_summary.py) of each row of the cached rate array of an
+    AtChem2 rate output file (in the same order as cached_rate_array, only
+    including the rows of a list of "species" if given). Returns None if 
+    there isn't a valid cache with block summaries"""
+    directory=cache_path(out_path)
+    if not _cache_is_valid(out_path, directory):
+        return None
+    try:
+        arrays=_load_cache(directory, ["species","block_size"]+
+                           ["block_"+n for n in SUMMARIES])
+    except (OSError, ValueError): #cache made without block summaries
+        return None
+
+    rows=slice(None) if species is None else np.isin(arrays["species"],
+                                                       species)
+    summaries={n:arrays["block_"+n][rows] for n in SUMMARIES}
+    summaries["block_size"]=int(arrays["block_size"])
+
+    return summaries
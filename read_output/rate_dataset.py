@@ -0,0 +1,186 @@
+#imports
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from read_output.read_rate_output import filter_rate_tensor, process_pool
+from read_output.read_conc_output import read_conc_array
+from read_output.rate_cache import (cached_rate_array, cached_block_summaries,
+                                    cache_path, _cache_is_valid)
+from read_output.rate_tensor import RateTensor
+from read_output.families import load_families, family_totals
+
+class RateDataset:
+    """Class holding the time axis, reaction definitions and rates (as 
+    RateTensors) of the production and loss rate output files of an AtChem2
+    model run, and optionally the species concentrations"""
+
+    def __init__(self, times, production, loss, conc_times=None,
+                 conc_species=None, concs=None):
+        self.times=times #sorted array of model timesteps
+        self.production=production #RateTensor of production rates
+        self.loss=loss #RateTensor of loss rates
+        self.conc_times=conc_times #timesteps of the concentration output
+        self.conc_species=conc_species #species names of the concentrations
+        self.concs=concs #array of concentrations [time, species]
+
+    @property
+    def p_reactions(self):
+        """Dictionary of production reaction definitions by reactionNumber"""
+        return self.production.reactions
+
+    @property
+    def l_reactions(self):
+        """Dictionary of loss reaction definitions by reactionNumber"""
+        return self.loss.reactions
+
+    def p_rate_tensor(self, species="ALL", drop_0=True, drop_net_0=True,
+                      drop_rev=False, error_for_non_species=True,
+                      families=None):
+        """Function to produce a RateTensor of production rates filtered by
+        species, family and reaction type (see filter_rate_tensor)"""
+        return filter_rate_tensor(self.production, 1, species=species,
+                                  drop_0=drop_0, drop_net_0=drop_net_0,
+                                  drop_rev=drop_rev,
+                                  error_for_non_species=error_for_non_species,
+                                  families=families)
+
+    def l_rate_tensor(self, species="ALL", drop_0=True, drop_net_0=True,
+                      drop_rev=False, error_for_non_species=True,
+                      families=None):
+        """Function to produce a RateTensor of loss rates filtered by species,
+        family and reaction type (see filter_rate_tensor)"""
+        return filter_rate_tensor(self.loss, 0, species=species,
+                                  drop_0=drop_0, drop_net_0=drop_net_0,
+                                  drop_rev=drop_rev,
+                                  error_for_non_species=error_for_non_species,
+                                  families=families)
+
+    def p_rates(self, species="ALL", drop_0=True, drop_net_0=True,
+                drop_rev=False, error_for_non_species=True, families=None):
+        """Function to produce the nested dictionary of production rates
+        indexed by species and reactionNumber (as from read_p_rates)"""
+        return self.p_rate_tensor(species=species, drop_0=drop_0,
+                                  drop_net_0=drop_net_0, drop_rev=drop_rev,
+                                  error_for_non_species=error_for_non_species,
+                                  families=families).to_dict()
+
+    def l_rates(self, species="ALL", drop_0=True, drop_net_0=True,
+                drop_rev=False, error_for_non_species=True, families=None):
+        """Function to produce the nested dictionary of loss rates indexed by
+        species and reactionNumber (as from read_l_rates)"""
+        return self.l_rate_tensor(species=species, drop_0=drop_0,
+                                  drop_net_0=drop_net_0, drop_rev=drop_rev,
+                                  error_for_non_species=error_for_non_species,
+                                  families=families).to_dict()
+
+    def p_family_totals(self, families=None):
+        """Function to calculate the total production rate of each family (in
+        a dictionary or config file, see read_output/families.py) at each 
+        timestep, returned as a dictionary indexed by family"""
+        return family_totals(self.production.reaction_numbers,
+                             self.production.values, self.p_reactions,
+                             load_families(families), 1)
+
+    def l_family_totals(self, families=None):
+        """Function to calculate the total loss rate of each family (in a 
+        dictionary or config file, see read_output/families.py) at each 
+        timestep, returned as a dictionary indexed by family"""
+        return family_totals(self.loss.reaction_numbers, self.loss.values,
+                             self.l_reactions, load_families(families), 0)
+
+def read_rate_dataset(out_path, cache=True, window=None, species=None,
+                      n_workers=None):
+    """Function to read the productionRates.output and lossRates.output files
+    in the AtChem2 output directory "out_path", parsing each file once, into
+    a RateDataset. If "cache" is True the parsed files are stored in (and 
+    subsequently loaded from) a binary cache in the output directory. If 
+    "window" (a slice of timestep indexes) or a list of "species" is given 
+    then only those timesteps/species are read. If "n_workers" is more than 
+    1 then each file is parsed in chunks by a pool of that many processes"""
+    production=cached_rate_array(out_path+"/productionRates.output",
+                                 cache=cache, window=window, species=species,
+                                 n_workers=n_workers)
+    loss=cached_rate_array(out_path+"/lossRates.output", cache=cache,
+                           window=window, species=species, n_workers=n_workers)
+
+    return _rate_dataset(out_path, production, loss, cache=cache and
+                         window is None, species=species)
+
+def _rate_dataset(out_path, production, loss, concentrations=(None,None,None),
+                  cache=False, species=None):
+    """Function to create a RateDataset from the outputs of cached_rate_array
+    for the production and loss rate files (and of read_conc_array). If 
+    "cache" is True then the block summaries of the cached rates (of all 
+    timesteps) are also loaded"""
+    p_times,p_sp,p_rn,p_arr,p_reactions=production
+    l_times,l_sp,l_rn,l_arr,l_reactions=loss
+
+    if not np.array_equal(p_times,l_times):
+        raise ValueError(f"""Timesteps in the production and loss rate output
+                         files in {out_path} do not match""")
+
+    p_summaries,l_summaries=None,None
+    if cache:
+        p_summaries=cached_block_summaries(out_path+"/productionRates.output",
+                                           species=species)
+        l_summaries=cached_block_summaries(out_path+"/lossRates.output",
+                                           species=species)
+
+    return RateDataset(p_times,
+                       RateTensor.from_pairs(p_times, p_sp, p_rn, p_arr,
+                                             p_reactions,
+                                             summaries=p_summaries),
+                       RateTensor.from_pairs(l_times, l_sp, l_rn, l_arr,
+                                             l_reactions,
+                                             summaries=l_summaries),
+                       *concentrations)
+
+def read_model_output(out_path, cache=True, window=None, species=None,
+                      concentrations=True, n_workers=None):
+    """Function to read the productionRates.output, lossRates.output and 
+    (if "concentrations" is True) speciesConcentrations.output files in the 
+    AtChem2 output directory "out_path" concurrently into a single 
+    RateDataset (see read_rate_dataset for the other arguments). The 
+    concentrations (at every timestep, of the selected species if given) are
+    stored in its conc_times, conc_species and concs. Files with a
+    valid cache are memory-mapped in a thread pool, and files that need to be
+    parsed are parsed in a pool of processes, so the time taken is about 
+    that of the largest file rather than the sum of all of them. If 
+    "n_workers" is more than 1, rate files that need to be parsed are 
+    instead parsed one at a time, each in chunks by a pool of "n_workers"
+    processes"""
+    files=[out_path+"/productionRates.output", out_path+"/lossRates.output"]
+    conc_file=out_path+"/speciesConcentrations.output"
+    if concentrations:
+        files.append(conc_file)
+    parse=[f for f in files if not (cache and 
+                                    _cache_is_valid(f, cache_path(f)))]
+
+    #rate files parsed in chunks (before starting any threads)
+    parsed={}
+    if n_workers is not None and n_workers > 1:
+        for f in [f for f in parse if f != conc_file]:
+            parsed[f]=cached_rate_array(f, cache=cache, window=window,
+                                        species=species, n_workers=n_workers)
+        parse=[f for f in parse if f not in parsed]
+
+    #files to parse are submitted first, so processes are started before any
+    #threads
+    with process_pool(max(len(parse),1)) as processes, \
+         ThreadPoolExecutor(max_workers=len(files)) as threads:
+        futures={}
+        for f in sorted([f for f in files if f not in parsed],
+                        key=lambda f: f not in parse):
+            pool=processes if f in parse else threads
+            if f == conc_file:
+                #concentrations of the selected species, if there are any
+                futures[f]=pool.submit(read_conc_array, f, 
+                                       species=species or "ALL", cache=cache,
+                                       error_for_non_species=False)
+            else:
+                futures[f]=pool.submit(cached_rate_array, f, cache=cache,
+                                       window=window, species=species)
+        results=[parsed[f] if f in parsed else futures[f].result() 
+                 for f in files]
+
+    return _rate_dataset(out_path, *results, cache=cache and
+                         window is None, species=species)
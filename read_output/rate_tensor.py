@@ -0,0 +1,212 @@
+#imports
+import numpy as np
+from read_output.block_summary import (block_summaries, select_summary_rows,
+                                       window_stats)
+from read_output.reaction_index import equation_index, lookup_equations
+
+def reduce_groups(values, indptr, ufunc=np.add):
+    """Function to reduce the rows of an array in contiguous groups (rows
+    indptr[i]:indptr[i+1] are group i) with a ufunc (e.g. np.add), returning
+    an array with a row for each group. Groups without any rows, which
+    reduceat doesn't handle, are 0"""
+    indptr=np.asarray(indptr, dtype=np.int64)
+    counts=np.diff(indptr)
+    out=np.zeros((len(counts),)+np.shape(values)[1:])
+    full=counts > 0
+    if np.any(full):
+        out[full]=ufunc.reduceat(values, indptr[:-1][full], axis=0)
+
+    return out
+
+class RateTensor:
+    """Class holding the rates of each species/reaction pair of an AtChem2
+    rate output file at each timestep. The rates are stored as a contiguous
+    2-D array with a row for each pair and a column for each timestep. Rows
+    are grouped by species with a compressed (CSR-style) index, so the rows
+    of species i are values[indptr[i]:indptr[i+1]], and reaction_numbers
+    holds the reactionNumber of each row. "summaries" optionally holds block
+    summaries of the rows (see read_output/block_summary.py)"""
+
+    def __init__(self, times, species, indptr, reaction_numbers, values,
+                 reactions, summaries=None):
+        self.times=np.asarray(times) #sorted array of timesteps
+        self.species=np.asarray(species, dtype=str) #species names
+        self.indptr=np.asarray(indptr, dtype=np.int64) #first row of each species
+        self.reaction_numbers=np.asarray(reaction_numbers) #reactionNumber of each row
+        self.values=values #array of rates [pair, time]
+        self.reactions=reactions #dictionary of reaction definitions by reactionNumber
+        self.summaries=summaries #block summaries of each row
+        self._equation_index=None #reactionNumbers of each equation
+
+    @classmethod
+    def from_pairs(cls, times, pair_species, reaction_numbers, values,
+                   reactions, species=None, summaries=None):
+        """Function to create a RateTensor from the species name and
+        reactionNumber of each row of a rate array (see rate_array). Rows are
+        grouped by species in order of first appearance (or the order of
+        "species" if given, which can include species without rows), keeping
+        the order of the reactions of each species"""
+        pair_species=np.asarray(pair_species, dtype=str)
+        if species is None:
+            names,first=np.unique(pair_species, return_index=True)
+            species=names[np.argsort(first, kind="stable")]
+        species=np.asarray(species, dtype=str)
+
+        #position of each row's species in "species" (-1 for rows of other
+        #species, which are dropped)
+        lookup={s:i for i,s in enumerate(species.tolist())}
+        codes=np.array([lookup.get(s,-1) for s in pair_species.tolist()],
+                       dtype=np.int64)
+
+        rows=np.flatnonzero(codes >= 0)
+        rows=rows[np.argsort(codes[rows], kind="stable")]
+        indptr=np.zeros(len(species)+1, dtype=np.int64)
+        indptr[1:]=np.cumsum(np.bincount(codes[rows], minlength=len(species)))
+
+        #avoid copying the rates if the rows are already grouped
+        if not np.array_equal(rows, np.arange(len(pair_species))):
+            values=values[rows]
+            summaries=select_summary_rows(summaries, rows)
+
+        return cls(times, species, indptr, np.asarray(reaction_numbers)[rows],
+                   values, reactions, summaries)
+
+    def __len__(self):
+        """Number of species/reaction pairs (rows)"""
+        return len(self.reaction_numbers)
+
+    @property
+    def pair_species(self):
+        """Array of the species name of each row"""
+        return np.repeat(self.species, np.diff(self.indptr))
+
+    def species_rows(self, s):
+        """Function to return the slice of rows of species "s" """
+        i=np.flatnonzero(self.species == s)
+        if len(i) == 0:
+            raise KeyError(s)
+        return slice(self.indptr[i[0]], self.indptr[i[0]+1])
+
+    @property
+    def equation_index(self):
+        """Dictionary of the reactionNumbers of each reaction equation (see
+        equation_index), built once"""
+        if self._equation_index is None:
+            self._equation_index=equation_index(self.reactions)
+        return self._equation_index
+
+    def equation_mask(self, equations):
+        """Function to return a boolean mask of the rows whose reaction 
+        equation is in the list "equations" (for all species at once)"""
+        return np.isin(self.reaction_numbers,
+                       lookup_equations(self.equation_index, equations))
+
+    def select_species(self, species, error_for_non_species=True):
+        """Function to select the rows of a list of species, in that order.
+        Species that aren't present raise a KeyError unless
+        error_for_non_species is False, in which case they are skipped"""
+        codes=[]
+        rows=[]
+        for s in dict.fromkeys(species): #remove duplicates, keeping order
+            i=np.flatnonzero(self.species == s)
+            if len(i) == 0:
+                if error_for_non_species:
+                    raise KeyError(s)
+                continue
+            codes.append(i[0])
+            rows.append(np.arange(self.indptr[i[0]], self.indptr[i[0]+1]))
+
+        indptr=np.zeros(len(codes)+1, dtype=np.int64)
+        indptr[1:]=np.cumsum([len(r) for r in rows])
+        rows=np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+
+        return RateTensor(self.times, self.species[codes], indptr,
+                          self.reaction_numbers[rows], self.values[rows],
+                          self.reactions,
+                          select_summary_rows(self.summaries, rows))
+
+    def select_rows(self, mask):
+        """Function to select the rows where the boolean array "mask" is True,
+        keeping all species (including those left without any rows)"""
+        rows=np.flatnonzero(mask)
+        codes=np.repeat(np.arange(len(self.species)), np.diff(self.indptr))
+        indptr=np.zeros(len(self.species)+1, dtype=np.int64)
+        indptr[1:]=np.cumsum(np.bincount(codes[rows],
+                                         minlength=len(self.species)))
+
+        return RateTensor(self.times, self.species, indptr,
+                          self.reaction_numbers[rows], self.values[rows],
+                          self.reactions,
+                          select_summary_rows(self.summaries, rows))
+
+    def select_reactions(self, numbers):
+        """Function to select the rows of a list of reactionNumbers"""
+        return self.select_rows(np.isin(self.reaction_numbers, numbers))
+
+    def window(self, window):
+        """Function to select a slice of timestep indexes (without copying
+        the rates)"""
+        return RateTensor(self.times[window], self.species, self.indptr,
+                          self.reaction_numbers, self.values[:,window],
+                          self.reactions)
+
+    def reduce(self, axis, how="sum"):
+        """Function to reduce the rates along an axis ("time", "reaction" or
+        "species") using "how" ("sum", "mean", "max" or "min"). Reducing over
+        time gives an array with a value for each row. Reducing over
+        reactions gives the species names and an array [species, time], and
+        reducing over species gives the reactionNumbers and an array
+        [reaction, time]"""
+        if how not in ["sum","mean","max","min"]:
+            raise ValueError("how must be 'sum', 'mean', 'max' or 'min'")
+        if axis == "time":
+            return getattr(np, how)(self.values, axis=1)
+
+        elif axis == "reaction": #group rows by species
+            labels=self.species
+            indptr=self.indptr
+            values=self.values
+
+        elif axis == "species": #group rows by reactionNumber
+            order=np.argsort(self.reaction_numbers, kind="stable")
+            labels,starts=np.unique(self.reaction_numbers[order],
+                                    return_index=True)
+            indptr=np.append(starts, len(order))
+            values=self.values[order]
+
+        else:
+            raise ValueError("axis must be 'time', 'reaction' or 'species'")
+
+        ufunc={"sum":np.add,"mean":np.add,"max":np.maximum,
+               "min":np.minimum}[how]
+        out=reduce_groups(values, indptr, ufunc)
+        if how == "mean":
+            counts=np.diff(indptr)
+            full=counts > 0
+            out[full]=out[full]/counts[full,None]
+
+        return labels, out
+
+    def window_stats(self, windows):
+        """Function to calculate the mean, sum, integral over time, maximum
+        and minimum of each row over each of a list of "windows" (slices of
+        timestep indexes), returning a dictionary of arrays [row, window]. 
+        Block summaries are used (and calculated first if there aren't any),
+        so each window only reads the timesteps at its ends"""
+        if self.summaries is None:
+            self.summaries=block_summaries(self.times, self.values)
+
+        return window_stats(self.times, self.values, self.summaries, windows)
+
+    def to_dict(self):
+        """Function to produce the nested dictionary of rates indexed by
+        species and reactionNumber (as from read_p_rates). Each entry is a
+        view of the corresponding row of the rate array"""
+        rates_dict={}
+        numbers=self.reaction_numbers.tolist()
+        for i,s in enumerate(self.species.tolist()):
+            rates_dict[s]={}
+            for row in range(self.indptr[i],self.indptr[i+1]):
+                rates_dict[s][numbers[row]]=self.values[row]
+
+        return rates_dict
@@ -0,0 +1,59 @@
+def split_reactions(reactions):
+    """Function to split a dictionary of reaction definitions into lists of
+    reactants and products"""
+    split={}
+    for r in reactions:
+        split[r]=[n.split("+") for n in reactions[r].split("=")]
+
+    return split
+
+def reaction_index(reactions):
+    """Function to index a dictionary of reaction definitions (indexed by
+    reactionNumber) by the set of reactants and set of products of each
+    reaction, i.e. (frozenset(reactants), frozenset(products)). Each key
+    holds the list of reactionNumbers with that definition"""
+    index={}
+    for r,(reactants,products) in split_reactions(reactions).items():
+        index.setdefault((frozenset(reactants),frozenset(products)),[]).append(r)
+
+    return index
+
+def reverse_reactions(reactions, index=None):
+    """Function to find the reverse of each reaction in a dictionary of
+    reaction definitions, i.e. reactions whose reactants are its products and
+    whose products are its reactants (e.g. NO3+NO2=N2O5 and N2O5=NO3+NO2).
+    The reverse reactions are looked up in "index" (from reaction_index,
+    defaulting to the index of "reactions" itself). Returns a dictionary of
+    the list of reverse reactionNumbers for each reaction that has any"""
+    if index is None:
+        index=reaction_index(reactions)
+
+    reverse={}
+    for r,(reactants,products) in split_reactions(reactions).items():
+        rev=index.get((frozenset(products),frozenset(reactants)))
+        if rev:
+            reverse[r]=rev
+
+    return reverse
+
+def equation_index(reactions):
+    """Function to invert a dictionary of reaction definitions (indexed by
+    reactionNumber), indexing it by equation. Each key holds the list of 
+    reactionNumbers with that equation"""
+    index={}
+    for r,eq in reactions.items():
+        index.setdefault(eq,[]).append(r)
+
+    return index
+
+def lookup_equations(index, equations):
+    """Function to find the reactionNumbers of a list of reaction equations 
+    in an index from equation_index, raising an exception if any of them 
+    aren't found"""
+    numbers=[]
+    for eq in equations:
+        if eq not in index:
+            raise Exception(f"Specified value ({eq}) doesn't exist in the dictionary")
+        numbers+=index[eq]
+
+    return numbers
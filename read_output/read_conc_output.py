@@ -1,5 +1,9 @@
 #imports
+import warnings
+import numpy as np
 import pandas as pd
+from read_output.rate_cache import (cache_path, _cache_is_valid, _write_cache,
+                                    _load_cache, _source_key)
 
 def conc_output(out_path="/home/alfie/AtChem2/model/output/speciesConcentrations.output",
                 species="ALL", **kwargs):
@@ -32,4 +36,71 @@ def conc_output(out_path="/home/alfie/AtChem2/model/output/speciesConcentrations
     #convert dataframe to dictionary indexed by time
     dict_data=data.set_index("t").to_dict()
     
-    return dict_data
\ No newline at end of file
+    return dict_data
+
+def conc_header(out_path):
+    """Function to read the column names (time and species) from the header
+    of an AtChem2 concentration output file"""
+    with open(out_path,"r") as file:
+        return file.readline().split()
+
+def _parse_conc_columns(out_path, columns):
+    """Function to parse only the named columns of a concentration output
+    file, returning the time axis and an array of the concentrations
+    [time, species]"""
+    data=pd.read_csv(out_path, sep=r"\s+", usecols=["t"]+columns,
+                     dtype=np.float64, engine="c",
+                     float_precision="round_trip") #times match the rates
+    times=data["t"].to_numpy()
+    concs=np.ascontiguousarray(data[columns].to_numpy(dtype=np.float64))
+
+    return times, concs
+
+def read_conc_array(out_path, species="ALL", cache=False,
+                    error_for_non_species=True):
+    """Function to read an AtChem2 concentration output file into the time
+    axis, the species names and a float64 array of concentrations
+    [time, species]. Only the columns of the species specified (a list or
+    string of species names, or "ALL") are parsed. Species not in the file
+    raise a KeyError unless error_for_non_species is False, in which case
+    they are skipped. If "cache" is True then a binary cache next to the file
+    is memory-mapped if there is one, and written when all species are read
+    (so reading a few species never parses every column)"""
+    header=conc_header(out_path)
+    if species=="ALL":
+        species=header[1:]
+    elif type(species)== str:
+        species=species.split()
+    elif type(species)!= list:
+        raise TypeError("""Species must be a list or string of species names to 
+                        select from the model output file (or "ALL" to 
+                        return all species present)""")
+
+    present=set(header[1:])
+    missing=[s for s in species if s not in present]
+    if missing and error_for_non_species:
+        raise KeyError(missing[0])
+    species=[s for s in dict.fromkeys(species) if s in present]
+
+    directory=cache_path(out_path)
+    if cache and _cache_is_valid(out_path, directory):
+        arrays=_load_cache(directory, ["times","species","concs"])
+    else:
+        key=_source_key(out_path) if cache and species == header[1:] else None
+        times,concs=_parse_conc_columns(out_path, species)
+        if key is not None: #only cache the whole file
+            try:
+                _write_cache(out_path, directory,
+                             {"times":times,
+                              "species":np.array(species, dtype=str),
+                              "concs":concs}, key)
+            except OSError as error: #e.g. if the output directory is read-only
+                warnings.warn(f"Unable to write cache for {out_path}: {error}")
+        return times, np.array(species, dtype=str), concs
+
+    columns={s:i for i,s in enumerate(arrays["species"].tolist())}
+    concs=arrays["concs"]
+    if species != arrays["species"].tolist(): #select the species' columns
+        concs=concs[:,[columns[s] for s in species]]
+
+    return arrays["times"], np.array(species, dtype=str), concs
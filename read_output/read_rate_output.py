@@ -1,299 +1,403 @@
-def time_list(out_path):
-    """Function to produce list of time steps from AtChem2 rate output file"""
+#imports
+import io
+import re
+import mmap
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from read_output.reaction_index import split_reactions, reverse_reactions
+from read_output.families import load_families, family_rate_tensor
+from read_output.rate_tensor import RateTensor
+
+#names and types of the columns in AtChem2 rate output files
+RATE_COLUMNS=["time","speciesNumber","speciesName","reactionNumber","rate",
+              "reaction"]
+RATE_DTYPES={"time":np.float64,"speciesNumber":np.int64,
+             "speciesName":"category","reactionNumber":np.int64,
+             "rate":np.float64,"reaction":"category"}
+
+def _parse_rate_block(source, skiprows=0):
+    """Function to parse whitespace separated lines of an AtChem2 rate output 
+    file (a path or file-like object) into a dictionary of typed columns.
+    Numbers are parsed with the round-trip parser, so the times match those
+    of rate_time_index (parsed with float) exactly"""
+    try:
+        data=pd.read_csv(source, sep=r"\s+", header=None, names=RATE_COLUMNS,
+                         dtype=RATE_DTYPES, skiprows=skiprows,
+                         float_precision="round_trip")
+    except pd.errors.EmptyDataError: #no lines to parse
+        data=pd.DataFrame({c:pd.Series(dtype=RATE_DTYPES[c]) 
+                           for c in RATE_COLUMNS})
     
-    with open(out_path,"r") as file:
-        lines=file.readlines()
-        lines=lines[1:] #remove first header line
-        
-    #remove new line characters and split each line by whitespace
-    for i,l in enumerate(lines):
-        lines[i]=l.strip("\n").split()
-
-    #initialise empty set to add times to
-    timeset=set()
-    for l in lines:
-        timeset.add(float(l[0]))
+    species_names=data["speciesName"].cat
+    reaction_eqs=data["reaction"].cat
     
-    times=sorted(timeset) #turn unordered set into ordered list
-
-    return times
+    cols={"time":data["time"].to_numpy(),
+          "speciesNumber":data["speciesNumber"].to_numpy(),
+          "speciesId":species_names.codes.to_numpy().astype(np.int32),
+          "reactionNumber":data["reactionNumber"].to_numpy(),
+          "rate":data["rate"].to_numpy(),
+          "speciesNames":species_names.categories.to_numpy(dtype=str)}
     
-def reaction_dict(out_path):
-    """Function to produce a dictionary of reactions in an AtChem2 rate output
-    file indexed by reactionNumber"""
-    with open(out_path,"r") as file:
-        lines=file.readlines()
-        lines=lines[1:] #remove first header line
-        
-    #remove new line characters and split each line by whitespace
-    for i,l in enumerate(lines):
-        lines[i]=l.strip("\n").split()
-
-    #make dictionary of reaction definitions for each reactionNumber
-    reactions={}
-    for l in lines:
-        reactions[int(l[3])]=l[5]
+    #make dictionary of reaction definitions for each reactionNumber from the
+    #first row each reaction appears in
+    numbers,first=np.unique(cols["reactionNumber"], return_index=True)
+    eqs=reaction_eqs.categories.to_numpy(dtype=str)[reaction_eqs.codes.to_numpy()[first]]
+    cols["reactions"]=dict(zip(numbers.tolist(),eqs.tolist()))
     
-    return reactions
-
-def read_p_rates(out_path, species="ALL", drop_0=True, drop_net_0=True, 
-                 drop_rev=False, error_for_non_species = True):
-    """function to convert production rate output files from AtChem2
-    into a nested dictionary containing lists of rates for each reaction at 
-    each timestep"""
-    #read lines of rate output file from atchem2
-    with open(out_path,"r") as file:
-        lines=file.readlines()
-        lines=lines[1:] #remove first header line
+    return cols
+
+def _merge_rate_columns(blocks):
+    """Function to merge the typed columns of consecutive blocks of lines 
+    (from _parse_rate_block) into the columns of all the lines, as if they
+    were parsed at once"""
+    if len(blocks) == 1:
+        return blocks[0]
     
-    #remove new line characters and split each line by whitespace
-    for i,l in enumerate(lines):
-        lines[i]=l.strip("\n").split()
+    #each block has its own (sorted) speciesNames, so map the speciesId of 
+    #each block onto the names of all blocks
+    names=np.unique(np.concatenate([b["speciesNames"] for b in blocks]))
+    species_ids=[np.searchsorted(names, b["speciesNames"]).astype(np.int32)[
+                 b["speciesId"]] for b in blocks]
     
-    #create dictionary of rates indexed by species and reactions number
-    rates={}
-    for l in lines: #add species index
-        rates[l[2]]={}
-
-    for l in lines: #add reactionNumber index and initialise with empty list
-        rates[l[2]][int(l[3])]=[]
-
-    for l in lines: #loop through list appending reaction rate at each timestep
-        rates[l[2]][int(l[3])]=rates[l[2]][int(l[3])]+[float(l[4])]
+    cols={c:np.concatenate([b[c] for b in blocks]) 
+          for c in ["time","speciesNumber","reactionNumber","rate"]}
+    cols["speciesId"]=np.concatenate(species_ids).astype(np.int32)
+    cols["speciesNames"]=names
     
-  
-
-    #create dictionary of reactions indexed by reaction number
     reactions={}
-    for l in lines:
-        reactions[int(l[3])]=l[5].split("=") #create list of two lists (reactants and products)
+    for b in blocks:
+        for r,eq in b["reactions"].items():
+            reactions.setdefault(r,eq)
+    cols["reactions"]=dict(sorted(reactions.items()))
     
-    for r in reactions: #split reactants and products by
-        for i,n in enumerate(reactions[r]):
-            reactions[r][i]=n.split("+")
-
-
-
-    #filter to only contain species specified in "species" input including 
-    #families of compounds e.g. NOx, where rates will be summed for each species
-    #produced in the family      
-    if species=="ALL":
-        pass
+    return cols
+
+def _parse_rate_range(out_path, start, end, species=None):
+    """Function to parse the lines between bytes "start" and "end" of an 
+    AtChem2 rate output file into typed columns, only parsing the lines of a
+    list of "species" if given"""
+    with open(out_path,"rb") as file, mmap.mmap(file.fileno(), 0, 
+                                                access=mmap.ACCESS_READ) as mm:
+        if species is None:
+            block=mm[start:end]
+        else:
+            block=_select_lines(mm, start, end, species)
     
-    elif species=="NOx": 
-        fam_spec=["NO","NO2","NO3","N2O5"] #list of species in family
-        temp_rates={} #create temporary dict to store summed NOx rates
-        temp_rates["NOx"]={}
-        #create dict of reaction multipliers for each reaction
-        r_mult={}
-        for i in reactions:
-            nox_count=0 #count number of nox species for each reactant
-            for r in set(reactions[i][1]): #set because don't want rates to be 
-                                           #multiplied by two e.g. if two NO2 
-                                           #are present in products (this is already done by AtChem2)
-                if r in fam_spec:
-                    if r == "N2O5": #N2O5 contains 2 N atoms, so must be counted twice
-                        nox_count=nox_count+2
-                    else:
-                        nox_count=nox_count+1
-            r_mult[i]=nox_count
-            
-        #multiply rates of each reaction by the nox count for that reaction,
-        #reactions corresponding to multiple species will be overwritten by the
-        #subsequent loops, but shouldn't be a problem as the rates should be 
-        #the same each time
-        for s in rates:
-            for r in rates[s]:
-                temp_rates["NOx"][r]=[x*r_mult[r] for x in rates[s][r]]
+    return _parse_rate_block(io.BytesIO(block))
+
+def _split_range(out_path, start, end, n_chunks):
+    """Function to split the bytes "start" to "end" of a file into (at most)
+    "n_chunks" ranges of about equal size, each ending at the end of a line.
+    Returns the list of start bytes and list of end bytes"""
+    bounds=[start]
+    with open(out_path,"rb") as file, mmap.mmap(file.fileno(), 0, 
+                                                access=mmap.ACCESS_READ) as mm:
+        for i in range(1,n_chunks):
+            pos=start+(end-start)*i//n_chunks
+            pos=mm.find(b"\n", max(pos-1,bounds[-1]), end)+1 or end
+            if pos > bounds[-1] and pos < end:
+                bounds.append(pos)
+    bounds.append(end)
+    
+    return bounds[:-1], bounds[1:]
+
+def process_pool(n_workers):
+    """Function to create a pool of "n_workers" processes. Processes are 
+    forked where possible, so the pool can be used from scripts without an
+    if __name__ == "__main__" guard (other start methods rerun the script in
+    each process)"""
+    if "fork" in multiprocessing.get_all_start_methods():
+        context=multiprocessing.get_context("fork")
+    else:
+        context=None
+
+    return ProcessPoolExecutor(max_workers=n_workers, mp_context=context)
+
+def _parse_rate_parallel(out_path, start, end, species, n_workers):
+    """Function to parse the lines between bytes "start" and "end" of an 
+    AtChem2 rate output file in a pool of "n_workers" processes. The bytes are
+    split into chunks ending at line boundaries, each chunk is parsed into 
+    typed columns by a worker and the columns are merged in order"""
+    #several chunks per worker to balance the load
+    starts,ends=_split_range(out_path, start, end, 4*n_workers)
+    n=len(starts)
+    with process_pool(n_workers) as pool:
+        blocks=list(pool.map(_parse_rate_range, [out_path]*n, starts, ends,
+                             [species]*n))
+    
+    return _merge_rate_columns(blocks)
+
+def read_rate_columns(out_path, species=None, n_workers=None):
+    """Function to read an AtChem2 rate output file in a single pass into 
+    typed columns (time, speciesNumber, speciesId, reactionNumber and rate). 
+    speciesId indexes the "speciesNames" array and "reactions" is a dictionary
+    of reaction definitions indexed by reactionNumber. If a list of "species"
+    is given then lines for other species are skipped before being parsed.
+    If "n_workers" is more than 1 then the file is parsed in chunks by a pool
+    of that many processes"""
+    if species is None and (n_workers is None or n_workers <= 1):
+        return _parse_rate_block(out_path, skiprows=1) #skip first header line
+    else:
+        return read_rate_window(out_path, slice(None), species=species,
+                                n_workers=n_workers)
+
+def _select_lines(mm, start, end, species, chunk_bytes=2**26):
+    """Function to return the lines between bytes "start" and "end" of a
+    memory-mapped rate output file whose speciesName is in "species". Lines
+    are checked on the speciesName field alone, without converting any of 
+    the other fields, in chunks of about "chunk_bytes" bytes"""
+    wanted={s.encode() for s in species}
+    if not wanted:
+        return b""
+    #species names with any whitespace (spaces or tabs) on either side
+    pattern=re.compile(rb"(?<=\s)(?:"+b"|".join(re.escape(s) for s in 
+                                                  sorted(wanted))+rb")(?=\s)")
+    selected=[]
+    while start < end:
+        #end chunk at the end of a line
+        stop=min(start+chunk_bytes,end)
+        if stop < end:
+            stop=mm.find(b"\n", stop-1, end)+1 or end
+        chunk=mm[start:stop]
         
-        #set temp_rates to be the new rates dict
-        rates=temp_rates
-                    
-    elif type(species)==list: #dictionary comprehension replaces rates with a 
-                              #new dict containing only the required entries
-        new_rates = {}
-        for s in species:
-            try:
-                new_rates[s] = rates[s]
-            except KeyError as error:
-                if error_for_non_species:
-                    raise error
-                else: #don't raise the key error for a missing species if specified
-                    pass
-        rates = new_rates
-
-    elif type(species)==str:
-        rates={ s: rates[s] for s in species.split() }
+        if len(wanted) <= 32:
+            #search for the species names surrounded by whitespace (which 
+            #only the speciesName field can be) and take the lines they are in
+            found=[]
+            match=pattern.search(chunk)
+            while match:
+                a=chunk.rfind(b"\n", 0, match.start())+1
+                b=chunk.find(b"\n", match.end())+1 or len(chunk)
+                if chunk[a:b].split(None,3)[2:3] == [match.group()]:
+                    found.append((a,b))
+                match=pattern.search(chunk, b)
+            selected.extend(chunk[a:b] for a,b in found)
+        else: #check the speciesName of every line
+            for line in chunk.splitlines(True):
+                fields=line.split(None,3)
+                if len(fields) > 2 and fields[2] in wanted:
+                    selected.append(line)
+        start=stop
+    
+    return b"".join(selected)
+
+def _line_time(mm, pos):
+    """Function to return the time of the line starting at byte "pos" of a 
+    memory-mapped rate output file, and the byte the following line starts 
+    at"""
+    end=mm.find(b"\n", pos)
+    if end == -1: #last line of the file has no newline character
+        end=len(mm)
+    
+    return float(mm[pos:end].split(None,1)[0]), end+1
+
+def rate_time_index(out_path):
+    """Function to index the timesteps of an AtChem2 rate output file by byte
+    offset. Returns the (sorted) times and an array of offsets, one longer 
+    than the times, where the lines of timestep i are the bytes 
+    offsets[i]:offsets[i+1]. The index is found by bisecting the file, which 
+    relies on the lines being ordered by time (as AtChem2 writes them), so 
+    only a small fraction of the file is read"""
+    with open(out_path,"rb") as file, mmap.mmap(file.fileno(), 0, 
+                                                access=mmap.ACCESS_READ) as mm:
+        data_start=mm.find(b"\n")+1 #skip first header line
+        data_end=len(mm)
+        if data_start == 0 or data_start >= data_end: #no timesteps in file
+            return np.array([]), np.array([data_end], dtype=np.int64)
         
-    else:
-        raise TypeError("""Species must be a list or string of species names to 
-                        select from the model output file (or left blank to 
-                        return all species present)""")
-
-
-
-    #initialise list to store indexes to remove from dict due to drop_0 and 
-    #drop_net_0
-    remove=[] 
-
-
-
-    #drop reactions where rate=0 throughout if specified in "drop_0" input   
-    if drop_0==True:
-        for s in rates:
-            for r in rates[s]:
-                if rates[s][r].count(0)==len(rates[s][r]): #if all values in list are 0
-                    remove.append([s,r])                    
-                else:
-                    pass
+        first_time=_line_time(mm, data_start)[0]
+        boundaries=[data_start]
+        #stack of ranges of lines [a,b) to search for changes in time, with 
+        #the time of the lines at a and b (None for the end of the file)
+        stack=[(data_start,first_time,data_end,None)]
+        while stack:
+            a,t_a,b,t_b=stack.pop()
             
-    elif drop_0==False:
-        pass
-      
-    else:
-        raise TypeError("""drop_0 must be input as boolean. Defaults to False""")
-
-
-
-    #drop any reactions where a species is both a product AND a reactant if 
-    #specified in "drop_net_0" input
-    if drop_net_0==True:
-        #make dictionary of reaction defniitions for each reactionNumber
-        for r in reactions:            
-            for s in reactions[r][1]: #iterate over all species in reaction products
-                #if number of that species in reactants= number in products
-                if reactions[r][0].count(s)==reactions[r][1].count(s):
-                    remove.append([s,r])
+            #find the start of a line between a and b, preferably near the
+            #middle of the range
+            mid=mm.find(b"\n", (a+b)//2, b)+1
+            if mid <= a or mid >= b:
+                mid=_line_time(mm, a)[1]
+            if mid >= b: #a and b are adjacent lines, so b starts a timestep
+                boundaries.append(b)
+                continue
+            
+            t_mid=_line_time(mm, mid)[0]
+            if t_mid != t_b:
+                stack.append((mid,t_mid,b,t_b))
+            if t_mid != t_a:
+                stack.append((a,t_a,mid,t_mid))
+        
+        offsets=np.array(sorted(boundaries), dtype=np.int64)
+        times=np.array([_line_time(mm, o)[0] for o in offsets[:-1]])
     
-    elif drop_0==False:
-        pass
+    return times, offsets
+
+def _window_range(window, n_times):
+    """Function to convert a slice of timestep indexes into the first and last
+    (exclusive) timestep index"""
+    if window is None:
+        window=slice(None)
+    start,stop,step=window.indices(n_times)
+    if step != 1:
+        raise ValueError("Window of timesteps must be contiguous")
     
+    return start, max(start,stop)
+
+def read_rate_window(out_path, window, species=None, n_workers=None):
+    """Function to read the timesteps selected by "window" (a slice of the 
+    timestep indexes, e.g. slice(10,20)) of an AtChem2 rate output file into
+    typed columns (as read_rate_columns). Only the bytes of those timesteps
+    are read and parsed, using the index from rate_time_index. If a list of 
+    "species" is given then only their lines are parsed. If "n_workers" is 
+    more than 1 then the bytes are parsed in chunks by a pool of that many
+    processes"""
+    times,offsets=rate_time_index(out_path)
+    start,stop=_window_range(window, len(times))
+    
+    if n_workers is None or n_workers <= 1:
+        cols=_parse_rate_range(out_path, offsets[start], offsets[stop], 
+                               species=species)
     else:
-        raise TypeError("""drop_net_0 must be input as boolean. Defaults to False""")
-
-
-
-    #drop reactions where another reaction is present in the reactions list
-    #that is the reverse, if specified in "drop_rev" input. e.g NO3+NO2=N2O5
-    if drop_rev==True:
-        for s in rates:
-            for r in rates[s]:
-                for i in reactions:
-                    r_eq_p=set(reactions[r][0])==set(reactions[i][1])
-                    p_eq_r=set(reactions[r][1])==set(reactions[i][0])
-                    if r_eq_p and p_eq_r:
-                            remove.append([s,r])
-   
-    elif drop_rev==False:
-        pass
+        cols=_parse_rate_parallel(out_path, offsets[start], offsets[stop],
+                                  species, n_workers)
+    
+    #take the reaction definitions from a whole timestep, so reactions not 
+    #involving the selected species (e.g. reverse reactions used by drop_rev)
+    #are still included
+    if species is not None and stop > start:
+        cols["reactions"]=_parse_rate_range(out_path, offsets[start], 
+                                            offsets[start+1])["reactions"]
+    
+    return cols
+
+def iter_rate_timesteps(out_path, window=None, species=None, 
+                        chunk_bytes=2**26):
+    """Generator to read an AtChem2 rate output file one timestep at a time, 
+    yielding the time and arrays of the speciesName, reactionNumber and rate
+    of each line in that timestep. The file is parsed in blocks of whole 
+    timesteps of about "chunk_bytes" bytes, so memory use doesn't depend on 
+    the size of the file. "window" (a slice of timestep indexes) selects a 
+    contiguous range of timesteps to read and "species" a list of species 
+    whose lines are parsed"""
+    times,offsets=rate_time_index(out_path)
+    start,stop=_window_range(window, len(times))
     
+    with open(out_path,"rb") as file, mmap.mmap(file.fileno(), 0, 
+                                                access=mmap.ACCESS_READ) as mm:
+        i=start
+        while i < stop:
+            #last timestep (exclusive) of the block, at least one timestep on
+            j=np.searchsorted(offsets, offsets[i]+chunk_bytes, side="right")-1
+            j=min(max(j,i+1),stop)
+            
+            if species is None:
+                block=mm[offsets[i]:offsets[j]]
+            else:
+                block=_select_lines(mm, offsets[i], offsets[j], species)
+            cols=_parse_rate_block(io.BytesIO(block))
+            names=cols["speciesNames"][cols["speciesId"]]
+            
+            #lines are ordered by time, so find where each timestep starts,
+            #checking every line has the time of the timestep it is given to
+            bounds=np.append(np.searchsorted(cols["time"], times[i:j]),
+                             len(cols["time"]))
+            if np.any(np.repeat(times[i:j], np.diff(bounds)) != cols["time"]):
+                raise ValueError(f"Times of the lines of {out_path} don't "
+                                 "match the timestep index")
+            for k in range(j-i):
+                lines=slice(bounds[k],bounds[k+1])
+                yield (times[i+k], names[lines], 
+                       cols["reactionNumber"][lines], cols["rate"][lines])
+            
+            i=j
+
+def rate_array(cols, times=None):
+    """Function to arrange the rate columns from read_rate_columns into a 
+    dense array with one row for each species/reaction pair and one column 
+    for each (sorted) timestep. Returns the times, the speciesId and 
+    reactionNumber of each row, and the array of rates (NaN where a pair is 
+    missing from a timestep). The sorted "times" can be given if there are 
+    timesteps without any lines in "cols" (e.g. after selecting species)"""
+    if times is None:
+        times,t_index=np.unique(cols["time"], return_inverse=True)
     else:
-        raise TypeError("""drop_rev must be input as boolean. Defaults to False""")
-
-
-
-    #remove indexes listed in "remove" from rates dict
-    for s, r in remove: 
-        try:
-            del rates[s][r]
-        
-        except KeyError: #reactions may be added to "remove" list twice, and 
-                         #raise a KeyError in second deletion
-            pass
-
+        t_index=np.searchsorted(times, cols["time"])
     
-    #return dict of rates indexed by species and reaction number
-    return rates
-        
-        
-def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True, 
-                 drop_rev=False, error_for_non_species = True):
-    """function to convert loss rate output files from AtChem2
-    into a nested dictionary containing lists of rates for each reaction at 
-    each timestep"""
-    #read lines of rate output file from atchem2
-    with open(out_path,"r") as file:
-        lines=file.readlines()
-        lines=lines[1:] #remove first header line
+    #combine speciesId and reactionNumber into a single integer key per line
+    n_r=int(cols["reactionNumber"].max())+1 if len(cols["time"]) else 1
+    key=cols["speciesId"].astype(np.int64)*n_r+cols["reactionNumber"]
+    keys,first,p_index=np.unique(key, return_index=True, return_inverse=True)
     
-    #remove new line characters and split each line by whitespace
-    for i,l in enumerate(lines):
-        lines[i]=l.strip("\n").split()
+    #order pairs by their first appearance in the file (as the old nested dict
+    #was ordered)
+    order=np.argsort(first, kind="stable")
+    rank=np.empty_like(order)
+    rank[order]=np.arange(len(order))
+    keys=keys[order]
     
-    #create dictionary of rates indexed by species and reactions number
-    rates={}
-    for l in lines: #add species index
-        rates[l[2]]={}
-
-    for l in lines: #add reactionNumber index and initialise with empty list
-        rates[l[2]][int(l[3])]=[]
-
-    for l in lines: #loop through list appending reaction rate at each timestep
-        rates[l[2]][int(l[3])]=rates[l[2]][int(l[3])]+[float(l[4])]
+    rates=np.full((len(keys),len(times)), np.nan)
+    rates[rank[p_index],t_index]=cols["rate"]
     
-  
+    return times, (keys//n_r).astype(np.int32), keys%n_r, rates
 
-    #create dictionary of reactions indexed by reaction number
-    reactions={}
-    for l in lines:
-        reactions[int(l[3])]=l[5].split("=") #create list of two lists (reactants and products)
+def time_list(out_path):
+    """Function to produce list of time steps from AtChem2 rate output file"""
+    return rate_time_index(out_path)[0].tolist()
+    
+def reaction_dict(out_path):
+    """Function to produce a dictionary of reactions in an AtChem2 rate output
+    file indexed by reactionNumber"""
+    return read_rate_columns(out_path)["reactions"]
+
+def _species_filter(species, families):
+    """Function to convert the "species" input of read_p_rates/read_l_rates 
+    into the list of species whose lines need to be parsed (None if all lines
+    are needed, e.g. for families)"""
+    if type(species)==list:
+        return species
+    elif type(species)==str and species!="ALL" and species not in families:
+        return species.split()
+    else:
+        return None
+
+def filter_rate_tensor(tensor, side, species="ALL", drop_0=True, 
+                       drop_net_0=True, drop_rev=False, 
+                       error_for_non_species=True, families=None):
+    """function to filter a RateTensor by species, family and reaction type.
+    "side" is 1 for production rates (family members counted in the 
+    products) and 0 for loss rates (counted in the reactants). "families" is
+    a dictionary or config file of families (see read_output/families.py)"""
+    families=load_families(families)
+    reactions=tensor.reactions
     
-    for r in reactions: #split reactants and products by
-        for i,n in enumerate(reactions[r]):
-            reactions[r][i]=n.split("+")
+    #find reactions with a reverse reaction in the reactions list (used by 
+    #drop_rev)
+    reversible=reverse_reactions(reactions) if drop_rev==True else {}
+    
+    #create dictionary of reactions indexed by reaction number, split into 
+    #lists of reactants and products
+    split=split_reactions(reactions)
 
 
 
     #filter to only contain species specified in "species" input including 
-    #families of compounds e.g. NOx, where rates will be summed for each species
-    #produced in the family      
+    #families of compounds e.g. NOx, where rates of each reaction are weighted
+    #by the family members produced
     if species=="ALL":
         pass
     
-    elif species=="NOx": 
-        fam_spec=["NO","NO2","NO3","N2O5"] #list of species in family
-        temp_rates={} #create temporary dict to store summed NOx rates
-        temp_rates["NOx"]={}
-        #create dict of reaction multipliers for each reaction
-        r_mult={}
-        for i in reactions:
-            nox_count=0 #count number of nox species for each reactant
-            for r in set(reactions[i][0]): #set because don't want rates to be 
-                                           #multiplied by two e.g. if two NO2 
-                                           #are present in products (this is already done by AtChem2)
-                if r in fam_spec:
-                    if r == "N2O5": #N2O5 contains 2 N atoms, so must be counted twice
-                        nox_count=nox_count+2
-                    else:
-                        nox_count=nox_count+1
-            r_mult[i]=nox_count
-            
-        #multiply rates of each reaction by the nox count for that reaction,
-        #reactions corresponding to multiple species will be overwritten by the
-        #subsequent loops, but shouldn't be a problem as the rates should be 
-        #the same each time
-        for s in rates:
-            for r in rates[s]:
-                temp_rates["NOx"][r]=[x*r_mult[r] for x in rates[s][r]]
-        
-        #set temp_rates to be the new rates dict
-        rates=temp_rates
+    elif type(species)==str and species in families:
+        tensor=family_rate_tensor(tensor, species, families[species], side)
                     
-    elif type(species)==list: #dictionary comprehension replaces rates with a 
-                              #new dict containing only the required entries
-        new_rates = {}
-        for s in species:
-            try:
-                new_rates[s] = rates[s]
-            except KeyError as error:
-                if error_for_non_species:
-                    raise error
-                else: #don't raise the key error for a missing species if specified
-                    pass
-        rates = new_rates
-        
+    elif type(species)==list: #select only the required species
+        tensor=tensor.select_species(species, 
+                                     error_for_non_species=error_for_non_species)
+
     elif type(species)==str:
-        rates={ s: rates[s] for s in species.split() }
+        tensor=tensor.select_species(species.split())
         
     else:
         raise TypeError("""Species must be a list or string of species names to 
@@ -302,20 +406,14 @@ def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True,
 
 
 
-    #initialise list to store indexes to remove from dict due to drop_0 and 
-    #drop_net_0
-    remove=[] 
+    #initialise mask of rows to keep after drop_0, drop_net_0 and drop_rev
+    keep=np.ones(len(tensor), dtype=bool)
 
 
 
     #drop reactions where rate=0 throughout if specified in "drop_0" input   
     if drop_0==True:
-        for s in rates:
-            for r in rates[s]:
-                if rates[s][r].count(0)==len(rates[s][r]): #if all values in list are 0
-                    remove.append([s,r])                    
-                else:
-                    pass
+        keep&=np.any(tensor.values, axis=1) #if all values in row are 0
             
     elif drop_0==False:
         pass
@@ -328,12 +426,16 @@ def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True,
     #drop any reactions where a species is both a product AND a reactant if 
     #specified in "drop_net_0" input
     if drop_net_0==True:
-        #make dictionary of reaction defniitions for each reactionNumber
-        for r in reactions:            
-            for s in reactions[r][1]: #iterate over all species in reaction products
-                #if number of that species in reactants= number in products
-                if reactions[r][0].count(s)==reactions[r][1].count(s):
-                    remove.append([s,r])
+        #make set of (species, reactionNumber) for each reaction where the 
+        #number of that species in reactants= number in products
+        net_0=set()
+        for r in split:            
+            for s in split[r][1]: #iterate over all species in reaction products
+                if split[r][0].count(s)==split[r][1].count(s):
+                    net_0.add((s,r))
+        keep&=np.array([p not in net_0 for p in 
+                        zip(tensor.pair_species.tolist(),
+                            tensor.reaction_numbers.tolist())], dtype=bool)
     
     elif drop_net_0==False:
         pass
@@ -346,13 +448,7 @@ def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True,
     #drop reactions where another reaction is present in the reactions list
     #that is the reverse, if specified in "drop_rev" input. e.g NO3+NO2=N2O5
     if drop_rev==True:
-        for s in rates:
-            for r in rates[s]:
-                for i in reactions:
-                    r_eq_p=set(reactions[r][0])==set(reactions[i][1])
-                    p_eq_r=set(reactions[r][1])==set(reactions[i][0])
-                    if r_eq_p and p_eq_r:
-                            remove.append([s,r])
+        keep&=~np.isin(tensor.reaction_numbers, list(reversible))
    
     elif drop_rev==False:
         pass
@@ -362,26 +458,44 @@ def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True,
 
 
 
-    #remove indexes listed in "remove" from rates dict
-    for s, r in remove: 
-        try:
-            del rates[s][r]
-        
-        except KeyError: #reactions may be added to "remove" list twice, and 
-                         #raise a KeyError in second deletion
-            pass
-    
-        
-    #return dict of rates indexed by species and reaction number
-    return rates       
-        
-        
-        
-        
-        
-        
-        
-        
+    #return tensor of rates without the dropped rows
+    if np.all(keep):
+        return tensor
+    else:
+        return tensor.select_rows(keep)
+
+def read_p_rates(out_path, species="ALL", drop_0=True, drop_net_0=True, 
+                 drop_rev=False, error_for_non_species = True,
+                 families=None):
+    """function to convert production rate output files from AtChem2
+    into a nested dictionary containing arrays of rates for each reaction at 
+    each timestep. "species" can also be the name of a family of species in
+    "families" (a dictionary or config file, see read_output/families.py)"""
+    families=load_families(families)
+    cols=read_rate_columns(out_path,
+                           species=_species_filter(species, families))
+    times,pair_species,pair_reactions,rate_arr=rate_array(cols)
+    tensor=RateTensor.from_pairs(times, cols["speciesNames"][pair_species],
+                                 pair_reactions, rate_arr, cols["reactions"])
+    return filter_rate_tensor(tensor, 1, species=species, drop_0=drop_0,
+                              drop_net_0=drop_net_0, drop_rev=drop_rev,
+                              error_for_non_species=error_for_non_species,
+                              families=families).to_dict()
         
-    
-    
\ No newline at end of file
+def read_l_rates(out_path, species="ALL", drop_0=True, drop_net_0=True, 
+                 drop_rev=False, error_for_non_species = True,
+                 families=None):
+    """function to convert loss rate output files from AtChem2
+    into a nested dictionary containing arrays of rates for each reaction at 
+    each timestep. "species" can also be the name of a family of species in
+    "families" (a dictionary or config file, see read_output/families.py)"""
+    families=load_families(families)
+    cols=read_rate_columns(out_path,
+                           species=_species_filter(species, families))
+    times,pair_species,pair_reactions,rate_arr=rate_array(cols)
+    tensor=RateTensor.from_pairs(times, cols["speciesNames"][pair_species],
+                                 pair_reactions, rate_arr, cols["reactions"])
+    return filter_rate_tensor(tensor, 0, species=species, drop_0=drop_0,
+                              drop_net_0=drop_net_0, drop_rev=drop_rev,
+                              error_for_non_species=error_for_non_species,
+                              families=families).to_dict()
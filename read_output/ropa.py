@@ -0,0 +1,286 @@
+#imports
+import glob
+import numpy as np
+import pandas as pd
+from read_output.rate_dataset import read_rate_dataset
+from read_output.read_rate_output import process_pool
+from read_output.reaction_index import reaction_index, reverse_reactions
+from read_output.ranking import rank_scores, rank_rows
+
+def time_window(times, start_t="START", end_t="END"):
+    """Function to convert start and end points (in model time, or "START"
+    and "END") into indexes of the list of model timesteps "times" to average
+    over"""
+    try:
+        start_i=times.index(int(start_t))
+    except ValueError:
+        if start_t=="START":
+            start_i=0
+        else:
+            raise Exception("start value must be integer or 'START'")
+    #convert "end" into integer
+    try:
+        end_i=times.index(int(end_t))
+    except ValueError:
+        if end_t=="END":
+            end_i=-1
+        else:
+            raise Exception("end value must be integer or 'END'")
+
+    return start_i, end_i
+
+def net_reversible_rates(p_rates, l_rates, p_reactions, l_reactions):
+    """Function to calculate the net production/loss of reversible reactions
+    from dictionaries of production and loss rates (from read_p_rates and
+    read_l_rates, or of average rates). Returns a dictionary with the same structure (with the
+    production reaction as key), and removes the reactions from p_rates and
+    l_rates"""
+    #find the reverse loss reaction(s) of each production reaction, using an
+    #index of the loss reactions by their reactants and products (built once)
+    rev_rxns=reverse_reactions(p_reactions, index=reaction_index(l_reactions))
+
+    #list the [species, production reaction, loss reaction] pairs present in
+    #the rates of each species
+    rev_pairs=[]
+    for s in p_rates:
+        if s in l_rates:
+            for rp in p_rates[s]:
+                for rl in rev_rxns.get(rp,[]):
+                    if rl in l_rates[s]:
+                        rev_pairs.append([s,rp,rl])
+
+    #net production/loss of all pairs in one subtraction
+    net_rates=(np.array([p_rates[s][rp] for s,rp,rl in rev_pairs])-
+               np.array([l_rates[s][rl] for s,rp,rl in rev_pairs]))
+
+    r_rates={} #create new dict to record reversible reactions
+    for (s,rp,rl),diffs in zip(rev_pairs,net_rates):
+        r_rates.setdefault(s,{})[rp]=diffs #record net production/loss
+
+    #remove reactions in r_rates from p_rates and l_rates
+    for s,rp,rl in rev_pairs:
+        p_rates[s].pop(rp,None)
+        l_rates[s].pop(rl,None)
+
+    return r_rates
+
+def _average_rate_dict(tensor, window, metric="mean"):
+    """Function to average the rates of each row of a RateTensor over a slice
+    of timestep indexes (in one reduction of the rate array), returning a 
+    dictionary of average rates indexed by species and reactionNumber, with
+    the reactions of each species ranked by "metric" (see rank_scores)"""
+    values=tensor.values[:,window]
+    avg=values.mean(axis=1)
+    rows,indptr=rank_rows(rank_scores(tensor.times[window], values, metric),
+                          tensor.indptr)
+    numbers=tensor.reaction_numbers[rows].tolist()
+    avg=avg[rows].tolist()
+
+    avg_rates={}
+    for i,s in enumerate(tensor.species.tolist()):
+        ranked=slice(indptr[i],indptr[i+1])
+        avg_rates[s]=dict(zip(numbers[ranked],avg[ranked]))
+
+    return avg_rates
+
+def average_rates(rate_data, species="ALL", start_t="START", end_t="END",
+                  window=None, metric="mean"):
+    """Function to calculate the average production, loss and net reversible
+    rates of each reaction of each species in a RateDataset between the
+    start and end points (in model time, or "START" and "END"), or over a 
+    slice of timestep indexes "window" if given. Returns three dictionaries
+    indexed by species and reactionNumber. Production and loss rates are 
+    ranked by "metric" over the window (see rank_scores, default the average
+    rate), and reversible rates are sorted by absolute value"""
+    if window is None:
+        window=slice(*time_window(rate_data.times.tolist(), start_t, end_t))
+
+    #average production and loss rates of the species of interest
+    avg_p_rates=_average_rate_dict(rate_data.p_rate_tensor(species=species),
+                                   window, metric)
+    avg_l_rates=_average_rate_dict(rate_data.l_rate_tensor(species=species),
+                                   window, metric)
+
+    #calculate net production/loss for reversible reactions (the average of
+    #the difference is the difference of the averages)
+    avg_r_rates=net_reversible_rates(avg_p_rates, avg_l_rates,
+                                     rate_data.p_reactions,
+                                     rate_data.l_reactions)
+
+    #sort net reversible rates by absolute value
+    avg_r_rates={s:{k: v for k, v in sorted(avg_r_rates[s].items(),
+                                            key=lambda item: abs(item[1]),
+                                            reverse=True)}
+                 for s in avg_r_rates}
+
+    return avg_p_rates, avg_l_rates, avg_r_rates
+
+def window_rates(rate_data, windows, species="ALL", stat="mean"):
+    """Function to calculate a statistic ("mean", "sum", "integral", "max" 
+    or "min") of the production and loss rates of each reaction of each 
+    species in a RateDataset over each of a list of "windows" (slices of 
+    timestep indexes, e.g. one for each day) at once, using the block 
+    summaries of the rates (see RateTensor.window_stats). Returns a DataFrame
+    with a row for each reaction of each species and a column for each 
+    window"""
+    tables=[]
+    for kind,tensor in [("production",rate_data.p_rate_tensor(species=species)),
+                        ("loss",rate_data.l_rate_tensor(species=species))]:
+        values=tensor.window_stats(windows)[stat]
+        index=pd.MultiIndex.from_arrays(
+            [[kind]*len(tensor), tensor.pair_species, tensor.reaction_numbers,
+             [tensor.reactions[r] for r in tensor.reaction_numbers.tolist()]],
+            names=["type","species","reactionNumber","reaction"])
+        tables.append(pd.DataFrame(values, index=index))
+
+    return pd.concat(tables)
+
+def average_rates_table(out_path, species="ALL", top_n=10, start_t="START",
+                        end_t="END", n_workers=None):
+    """Function to produce a table (DataFrame) of the top "top_n" average
+    production, loss and net reversible rates of each species in the AtChem2
+    output directory "out_path" (as printed by average_rates_analysis.py),
+    with a row for each reaction. Rate files are parsed in chunks by a pool
+    of "n_workers" processes if it is more than 1"""
+    rate_data=read_rate_dataset(out_path, n_workers=n_workers)
+    avg_p_rates,avg_l_rates,avg_r_rates=average_rates(rate_data, species,
+                                                      start_t, end_t)
+
+    rows=[]
+    for kind,avg_rates,reactions in [("production",avg_p_rates,
+                                      rate_data.p_reactions),
+                                     ("loss",avg_l_rates,rate_data.l_reactions),
+                                     ("reversible",avg_r_rates,
+                                      rate_data.p_reactions)]:
+        for s in avg_rates:
+            total_sum=sum(avg_rates[s].values())
+            for rank,(r,rate) in enumerate(list(avg_rates[s].items())[:top_n]):
+                rows.append({"type":kind, "species":s, "rank":rank+1,
+                             "reactionNumber":r, "reaction":reactions[r],
+                             "average_rate":rate,
+                             "percentage":(rate/total_sum)*100 if
+                             kind != "reversible" else np.nan})
+
+    return pd.DataFrame(rows, columns=["type","species","rank",
+                                       "reactionNumber","reaction",
+                                       "average_rate","percentage"])
+
+def expand_run_dirs(out_paths):
+    """Function to expand a comma separated list of paths to model output
+    directories, each of which can be a glob pattern, into a list of 
+    directories (keeping the order given, without duplicates, and keeping 
+    paths that don't match anything so they are reported as failed)"""
+    dirs=[]
+    for pattern in out_paths.split(","):
+        dirs.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    return list(dict.fromkeys(dirs))
+
+def _average_rates_run(out_path, species, top_n, start_t, end_t,
+                       parse_workers):
+    """Function to produce the table of average rates of one output 
+    directory (see average_rates_table) in a batch, returning the table and
+    None, or None and the error if the analysis fails"""
+    try:
+        return average_rates_table(out_path, species, top_n, start_t,
+                                   end_t, parse_workers), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+def batch_average_rates(out_paths, species="ALL", top_n=10, start_t="START",
+                        end_t="END", n_workers=None, parse_workers=None):
+    """Function to produce the tables of average rates (see 
+    average_rates_table) of many AtChem2 output directories in a pool of 
+    "n_workers" processes (defaulting to the number of CPUs), each parsing
+    its rate files in chunks with "parse_workers" processes. Returns one 
+    table with a "run" column for the output directory of each row, and a
+    dictionary of the errors of any runs that failed (which don't stop the
+    other runs)"""
+    tables=[]
+    errors={}
+    with process_pool(n_workers) as pool:
+        futures=[pool.submit(_average_rates_run, out_path, species, top_n,
+                             start_t, end_t, parse_workers) 
+                   for out_path in out_paths]
+        for out_path,future in zip(out_paths,futures):
+            try:
+                table,error=future.result()
+            except Exception as pool_error: #e.g. if the worker was killed
+                table,error=None,f"{type(pool_error).__name__}: {pool_error}"
+            if error is None:
+                table.insert(0, "run", out_path)
+                tables.append(table)
+            else:
+                errors[out_path]=error
+
+    if tables:
+        table=pd.concat(tables, ignore_index=True)
+    else:
+        table=pd.DataFrame(columns=["run","type","species","rank",
+                                    "reactionNumber","reaction",
+                                    "average_rate","percentage"])
+
+    return table, errors
+
+def sum_by_equation(tensor, values, columns):
+    """Function to sum the rows of an array of rates "values" (one row for
+    each pair of a RateTensor, e.g. its rates [pair, time] or their averages)
+    with the same species and reaction equation, so runs with different 
+    reactionNumbers can be matched. Returns a DataFrame indexed by species 
+    and reaction, with "columns" as its columns"""
+    equations=np.array([tensor.reactions[r] for r in 
+                        tensor.reaction_numbers.tolist()], dtype=str)
+    index=pd.MultiIndex.from_arrays([tensor.pair_species, equations],
+                                    names=["species","reaction"])
+    rates=pd.DataFrame(np.reshape(values, (len(index),-1)), index=index,
+                       columns=columns)
+
+    return rates.groupby(level=["species","reaction"], sort=False).sum()
+
+def _average_by_equation(tensor, times, start_i, end_i):
+    """Function to average the rates of a RateTensor over timesteps 
+    start_i:end_i of "times" (a subset of the tensor's timesteps), returning
+    a DataFrame of the average rate of each species and reaction equation 
+    (summing reactions with the same equation)"""
+    columns=np.searchsorted(tensor.times, times)[start_i:end_i]
+    #pairs missing from a timestep have no rate
+    avg=np.nan_to_num(tensor.values[:,columns]).mean(axis=1)
+
+    return sum_by_equation(tensor, avg, ["rate"])
+
+def compare_average_rates(base, perturbed, species="ALL", start_t="START",
+                          end_t="END"):
+    """Function to compare the average production and loss rates of each 
+    reaction of each species in two RateDatasets (e.g. a base and perturbed
+    scenario) between the start and end points (in model time, or "START" 
+    and "END"). Reactions are matched by their equation (as reactionNumbers 
+    can differ between mechanisms) and only the timesteps of both runs are 
+    used. Returns a DataFrame with a row for each reaction of each species, 
+    with the average rates, the absolute change and the relative change 
+    (change/base rate), sorted by the size of the absolute change"""
+    times=np.intersect1d(base.times, perturbed.times)
+    start_i,end_i=time_window(times.tolist(), start_t, end_t)
+
+    tables=[]
+    for kind,side in [("production","p"),("loss","l")]:
+        rates=[]
+        for rate_data in [base,perturbed]:
+            tensor=getattr(rate_data, f"{side}_rate_tensor")(
+                species=species, error_for_non_species=False)
+            rates.append(_average_by_equation(tensor, times, start_i, end_i))
+
+        #align the reactions of the two runs (reactions in only one run have
+        #no rate in the other)
+        table=rates[0].join(rates[1], how="outer", lsuffix="_base",
+                            rsuffix="_perturbed").fillna(0.0)
+        table.insert(0, "type", kind)
+        tables.append(table)
+
+    table=pd.concat(tables).reset_index()
+    table=table[["type","species","reaction","rate_base","rate_perturbed"]]
+    table["change"]=table["rate_perturbed"]-table["rate_base"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["relative_change"]=table["change"]/table["rate_base"]
+
+    order=np.argsort(-np.abs(table["change"].to_numpy()), kind="stable")
+    return table.iloc[order].reset_index(drop=True)
@@ -1,8 +1,10 @@
-"""script to produce the total rate of reaction for a species (in s-1) from 
-AtChem2 output files"""
+"""script to produce the total rate of reaction for a species (in s-1) from
+AtChem2 output files. If "ALL" or a comma separated list of species is given
+then the budget (total production, total loss, net rate, first-order loss
+frequency and lifetime) of every species is calculated at once"""
 #imports
-from read_output.read_rate_output import read_p_rates, read_l_rates, time_list
-from read_output.read_conc_output import conc_output
+from read_output.rate_dataset import read_model_output
+from read_output.budgets import species_budget
 import sys
 import pandas as pd
 
@@ -10,43 +12,51 @@ import pandas as pd
 args=sys.argv
 
 if len(args)<3: #if not enough args provided
-        raise Exception("""Requred arguments are (in this order): 
+        raise Exception("""Requred arguments are (in this order):
                         - path to model output file
-                        - species of interest (individual species only)""")
+                        - species of interest (individual species, comma
+                          separated list of species or "ALL")""")
 
 else: #note args[0] will be the name of this script
     out_path=args[1] #give path to model output directory
     species=args[2] #define species to be picked out
 
+#convert species into list type (unless "ALL")
+if species!="ALL":
+    species=species.split(",")
+
+
+#read production and loss rate and concentration output files concurrently 
+#(each file is parsed once, and only the lines/columns of the species of
+#interest)
+rate_data=read_model_output(out_path, species=None if species=="ALL" 
+                            else species)
 
 #make list of model time steps
-times=time_list(out_path+"/productionRates.output")
-
-#read production rates output file and record NO3 production rates
-p_rates=read_p_rates(out_path+"/productionRates.output", species=species)
-l_rates=read_l_rates(out_path+"/lossRates.output",species=species)
-
-#get concentration for species at each timestep (used to convert rate constants 
-#from molecule_cm-3_s-1 to s-1)
-concs=conc_output(out_path+"/speciesConcentrations.output",species)
-
-#sum all production rates for the species of interest (for each timestep)
-total_prod=pd.DataFrame(index=times,columns=[species])
-for i,t in enumerate(times):
-    temp_sum=0
-    for r in p_rates[species]:
-        temp_sum=temp_sum+p_rates[species][r][i]
-    total_prod.loc[t,species]=temp_sum/concs[species][t] #divide by conc to convert to s-1
-#sum all loss rates for the species of interest (for each timestep)
-total_loss=pd.DataFrame(index=times)
-for i,t in enumerate(times):
-    temp_sum=0
-    for r in l_rates[species]:
-        temp_sum=temp_sum+l_rates[species][r][i]
-    total_loss.loc[t,species]=temp_sum/concs[species][t] #divide by conc to convert to s-1
-
-#take difference between production and loss to get overall rate (+ve=production, -ve=loss)
-rate_diff=total_prod-total_loss
-
-#output to file
-rate_diff.to_csv("temp_total_rates", sep=" ")
+times=rate_data.times.tolist()
+
+#record production and loss rates of the species of interest (species may
+#only have production or loss reactions)
+p_rates=rate_data.p_rate_tensor(species=species, error_for_non_species=False)
+l_rates=rate_data.l_rate_tensor(species=species, error_for_non_species=False)
+
+#sum all production and loss rates of every species (for each timestep), with
+#concentrations (used to convert rates from molecule_cm-3_s-1 to s-1) aligned
+#to the rates by timestep index
+budget=species_budget(p_rates, l_rates, conc_times=rate_data.conc_times,
+                      conc_species=rate_data.conc_species, 
+                      concs=rate_data.concs)
+
+
+#output to files with a column for each species. Difference between
+#production and loss divided by concentration gives overall rate in s-1
+#(+ve=production, -ve=loss)
+pd.DataFrame(budget["net_s-1"].T, index=times,
+             columns=budget["species"]).to_csv("temp_total_rates", sep=" ")
+
+#total production, loss and net rates (molecule cm-3 s-1), first-order loss
+#frequency (s-1) and lifetime (s)
+for name in ["production","loss","net","loss_frequency","lifetime"]:
+    pd.DataFrame(budget[name].T, index=times,
+                 columns=budget["species"]).to_csv(f"temp_species_{name}",
+                                                   sep=" ")
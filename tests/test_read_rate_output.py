@@ -0,0 +1,56 @@
+#imports
+import numpy as np
+import pytest
+from read_output.read_rate_output import iter_rate_timesteps, rate_time_index
+from read_output.rate_cache import cached_rate_array
+
+#16 significant digit times (as written by AtChem2) which pandas' default
+#float parser reads 1 ulp away from float()
+TIMES=["9.071948099271851E+04","9.147375510338921E+04","9.202205770399311E+04",
+       "9.324695883146975E+04","9.422631561856027E+04","9.451745096640305E+04",
+       "9.484739575237193E+04","9.578415659130005E+04"]
+
+#species name, reactionNumber and reaction of each line of a timestep
+LINES=[("NO2",3,"NO+O3=NO2"),("NO2",7,"HO2+NO=OH+NO2"),("O3",1,"O+O2=O3"),
+       ("NO",8,"NO2=NO+O")]
+
+@pytest.fixture
+def rate_file(tmp_path):
+    """Function to write a rate output file with 16 digit times, where the
+    rate of each line is its line number"""
+    path=tmp_path/"productionRates.output"
+    rows=["time speciesNumber speciesName reactionNumber rate reaction"]
+    for i,t in enumerate(TIMES):
+        for j,(s,r,eq) in enumerate(LINES):
+            rows.append(f"  {t}      {j+1}          {s}      {r}  "
+                        f"{float(i*len(LINES)+j):.16E} {eq}")
+    path.write_text("\n".join(rows)+"\n")
+    return str(path)
+
+def test_time_index_matches_float(rate_file):
+    times,offsets=rate_time_index(rate_file)
+    assert times.tolist() == [float(t) for t in TIMES]
+
+@pytest.mark.parametrize("window",[slice(0,7),slice(1,5),slice(None)])
+@pytest.mark.parametrize("species",[None,["NO2"]])
+def test_window_read(rate_file, window, species):
+    times,pair_species,numbers,rates,reactions=cached_rate_array(
+        rate_file, cache=False, window=window, species=species)
+    expected_times=np.array([float(t) for t in TIMES])[window]
+    assert times.tolist() == expected_times.tolist()
+
+    lines=[(s,r) for s,r,eq in LINES if species is None or s in species]
+    assert list(zip(pair_species.tolist(),numbers.tolist())) == lines
+    #rate of each line is its line number in the file
+    t_index=np.arange(len(TIMES))[window]
+    for row,(s,r) in enumerate(lines):
+        j=[(l[0],l[1]) for l in LINES].index((s,r))
+        assert rates[row].tolist() == (t_index*len(LINES)+j).tolist()
+
+@pytest.mark.parametrize("species",[None,["NO2","O3"]])
+def test_iter_timesteps(rate_file, species):
+    lines=[(s,r) for s,r,eq in LINES if species is None or s in species]
+    steps=list(iter_rate_timesteps(rate_file, species=species, chunk_bytes=200))
+    assert [t for t,names,numbers,rates in steps] == [float(t) for t in TIMES]
+    for t,names,numbers,rates in steps:
+        assert list(zip(names.tolist(),numbers.tolist())) == lines